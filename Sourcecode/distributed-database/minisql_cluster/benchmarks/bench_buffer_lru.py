@@ -0,0 +1,42 @@
+"""measure the cost of a buffer miss once the pool is full
+the victim selection of BufferManager should be O(1), so the cost per miss must stay flat
+while total_blocks grows from 1k to 64k
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_buffer_lru"""
+import os
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+
+POOL_SIZES = (1024, 4096, 16384, 65536)
+MISSES = 20000
+
+
+def bench_miss(file_path, total_blocks):
+    BufferManager.total_blocks = total_blocks
+    manager = new_instance(BufferManager)  # the arena is sized on creation
+    for block_offset in range(total_blocks):  # fill the pool
+        manager.get_file_block(file_path, block_offset)
+    begin = time.perf_counter()
+    for block_offset in range(total_blocks, total_blocks + MISSES):  # every access is a miss
+        manager.get_file_block(file_path, block_offset)
+    elapsed = time.perf_counter() - begin
+    manager.detach_from_file(file_path)
+    return elapsed / MISSES
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'bench.table')
+        with open(file_path, 'wb') as file:  # a sparse file, so that the disk is not measured
+            file.truncate(BufferManager.block_size * (max(POOL_SIZES) + MISSES))
+        print('{:>12} {:>16}'.format('total_blocks', 'us per miss'))
+        for total_blocks in POOL_SIZES:
+            print('{:>12} {:>16.2f}'.format(total_blocks, bench_miss(file_path, total_blocks) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""measure detach_from_file() of a small file, e.g. an index dropped along with its table,
+against the number of blocks of other files cached in the buffer
+the blocks of a file are found through the per-file index of the shards, so the cost doesn't grow with the buffer
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_detach"""
+import os
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+
+POOL_SIZES = (1024, 4096, 16384, 65536)
+SMALL_FILE_BLOCKS = 8
+ROUNDS = 50
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        big_path = os.path.join(directory, 'big.table')
+        small_path = os.path.join(directory, 'small.index')
+        with open(big_path, 'wb') as file:
+            file.truncate(BufferManager.block_size * max(POOL_SIZES))
+        with open(small_path, 'wb') as file:
+            file.truncate(BufferManager.block_size * SMALL_FILE_BLOCKS)
+        print('{:>12} {:>16}'.format('total_blocks', 'us per detach'))
+        for total_blocks in POOL_SIZES:
+            manager = new_instance(BufferManager, total_blocks=total_blocks, read_ahead_blocks=0)
+            for offset in range(total_blocks - SMALL_FILE_BLOCKS):
+                manager.get_file_block(big_path, offset)
+            elapsed = 0.0
+            for _ in range(ROUNDS):
+                for offset in range(SMALL_FILE_BLOCKS):
+                    manager.get_file_block(small_path, offset)
+                begin = time.perf_counter()
+                manager.detach_from_file(small_path)
+                elapsed += time.perf_counter() - begin
+            print('{:>12} {:>16.2f}'.format(total_blocks, elapsed / ROUNDS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
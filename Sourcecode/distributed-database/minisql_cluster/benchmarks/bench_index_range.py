@@ -0,0 +1,75 @@
+"""measure the reads of a range select through a secondary index, whose keys are in no relation with the order
+of the records: the offsets found, in the order of the keys, read one by one with RecordManager.select, as before,
+against read in batches with RecordManager.select_many, as the facade does now, counting the blocks of the table
+pinned and read from the file, the buffer holding an eighth of the table
+in a batch, each block holding some of the records is pinned and read once
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_index_range"""
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.facade import _index_batch_records
+from minisql_cluster.src.record_manager import RecordManager
+
+FMT = '<i20sf'
+ROWS = 50000
+RANGES = (50, 500, 5000, 25000)  # the number of keys in the range
+
+
+def one_by_one(offsets):
+    for offset in offsets:
+        yield RecordManager.select('t', FMT, with_index=True, record_offset=offset)
+
+
+def batched(offsets):
+    offsets = iter(offsets)
+    while True:
+        record_offsets = list(itertools.islice(offsets, _index_batch_records))
+        if not record_offsets:
+            break
+        yield from RecordManager.select_many('t', FMT, record_offsets)
+
+
+def run(select, offsets):
+    manager = new_instance(BufferManager, singleton=True, manifest_path=None, total_blocks=64,
+                           read_ahead_blocks=0)  # only the blocks asked for are read
+    begin = time.perf_counter()
+    records = list(select(offsets))
+    elapsed = time.perf_counter() - begin
+    RecordManager.close_table('t')  # the next run opens it again on a new buffer
+    table = manager.stats['files']['table']
+    return records, elapsed, table['hits'] + table['misses'], table['misses']
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        RecordManager.set_file_dir(directory + os.sep)
+        keys = list(range(ROWS))
+        random.Random(0).shuffle(keys)
+        new_instance(BufferManager, singleton=True, manifest_path=None, total_blocks=4096)
+        RecordManager.init_table('t')
+        RecordManager.insert_many('t', FMT, [(key, 'name{}'.format(key), key * 1.5) for key in keys])
+        RecordManager.flush_headers()
+        BufferManager().flush_all()
+        RecordManager.close_table('t')
+        offsets_by_key = sorted(range(ROWS), key=keys.__getitem__)  # what the leaves of the index hold
+
+        print('{:>10} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+            'records', 'pins', 'batch pins', 'reads', 'batch reads', 'ms', 'batch ms'))
+        for size in RANGES:
+            offsets = offsets_by_key[:size]
+            results = [run(select, offsets) for select in (one_by_one, batched)]
+            assert results[0][0] == results[1][0]
+            print('{:>10} {:>12} {:>12} {:>12} {:>12} {:>12.2f} {:>12.2f}'.format(
+                size, results[0][2], results[1][2], results[0][3], results[1][3],
+                results[0][1] * 1e3, results[1][1] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
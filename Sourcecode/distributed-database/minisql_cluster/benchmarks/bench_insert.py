@@ -0,0 +1,78 @@
+"""measure inserts into a table, through RecordManager, for narrow and wide records,
+one row at a time and in a batch, and inserts into a B+ tree index, one key at a time and as a sorted batch
+an insert packs only the slot of the new record into the buffer, so its cost doesn't grow with the number
+of records per block, and the table stays open with its header in memory, written back once by flush_headers()
+a batch writes the records of a block at once, and the keys going into the same leaf of the index together
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_insert"""
+import os
+import random
+import tempfile
+import time
+from struct import calcsize
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.index_manager import IndexManager
+from minisql_cluster.src.record_manager import RecordManager
+
+ROWS = 20000
+FORMATS = (
+    ('<i', lambda i: (i,)),
+    ('<i20sf', lambda i: (i, 'name{}'.format(i), i * 1.5)),
+    ('<i200s', lambda i: (i, 'text{}'.format(i))),
+)
+KEYS = 5000
+
+
+def bench_table(table_name, fmt, rows, batch):
+    new_instance(BufferManager, singleton=True, manifest_path=None)  # RecordManager and IndexManager use it
+    RecordManager.init_table(table_name)
+    begin = time.perf_counter()
+    if batch:
+        RecordManager.insert_many(table_name, fmt, rows)
+    else:
+        for row in rows:
+            RecordManager.insert(table_name, fmt, row)
+    RecordManager.flush_headers()
+    return len(rows) / (time.perf_counter() - begin)
+
+
+def bench_index(file_path, keys, batch):
+    new_instance(BufferManager, singleton=True, manifest_path=None)  # RecordManager and IndexManager use it
+    index = IndexManager(file_path, '<i')
+    begin = time.perf_counter()
+    if batch:
+        index.insert_many(([key], key) for key in keys)
+    else:
+        for key in keys:
+            index.insert([key], key)
+    index.dump_header()
+    return len(keys) / (time.perf_counter() - begin)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        RecordManager.set_file_dir(directory + os.sep)
+        print('{:>10} {:>16} {:>14} {:>16}'.format('format', 'records/block', 'inserts/s', 'batch inserts/s'))
+        for number, (fmt, row) in enumerate(FORMATS):
+            rows = [row(i) for i in range(ROWS)]
+            single = bench_table('single{}'.format(number), fmt, rows, False)
+            batch = bench_table('batch{}'.format(number), fmt, rows, True)
+            records_per_block = BufferManager.block_size // calcsize(fmt + 'ci')  # a valid bit and a free-list link
+            print('{:>10} {:>16} {:>14.0f} {:>16.0f}'.format(fmt, records_per_block, single, batch))
+
+        print()
+        print('{:>10} {:>14} {:>16}'.format('int keys', 'inserts/s', 'batch inserts/s'))
+        for order in ('ascending', 'shuffled'):
+            keys = list(range(KEYS))
+            if order == 'shuffled':
+                random.Random(0).shuffle(keys)
+            single = bench_index(os.path.join(directory, 'single_{}.index'.format(order)), keys, False)
+            batch = bench_index(os.path.join(directory, 'batch_{}.index'.format(order)), keys, True)
+            print('{:>10} {:>14.0f} {:>16.0f}'.format(order, single, batch))
+
+
+if __name__ == '__main__':
+    main()
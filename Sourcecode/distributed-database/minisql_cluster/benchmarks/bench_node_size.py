@@ -0,0 +1,61 @@
+"""compare B+ trees on wide keys with nodes of 1, 4 and 16 blocks
+a larger node makes the tree shallower, so a lookup missing the buffer issues fewer reads, one vectored read
+per level, but every node visited is decoded as a whole, which costs cpu in proportion to its size
+a node takes a block unless another size is given when the index is created,
+e.g. create index name_index on t (name) with (node_size = 16384);
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_node_size"""
+import os
+import random
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.index_manager import IndexManager
+
+KEY_FORMAT = '<200s'  # a char(200) key
+KEYS = 20000
+LOOKUPS = 2000
+NODE_SIZES = (4096, 16384, 65536)
+
+
+def depth(index):
+    levels, block_offset = 0, index.root
+    while True:
+        with index._pinned_node(block_offset) as block:
+            node = index.Node.frombytes(block.read())
+        levels += 1
+        if node.is_leaf:
+            return levels
+        block_offset = node.children[0]
+
+
+def main():
+    keys = ['k{:08d}'.format(i) for i in range(KEYS)]
+    random.Random(0).shuffle(keys)
+    lookups = random.Random(1).choices(keys, k=LOOKUPS)
+    with tempfile.TemporaryDirectory() as directory:
+        print('{:>10} {:>7} {:>6} {:>10} {:>15} {:>24}'.format('node size', 'fanout', 'depth', 'insert us',
+                                                                 'cached find us', 'KB read per uncached find'))
+        for node_size in NODE_SIZES:
+            path = os.path.join(directory, '{}.index'.format(node_size))
+            new_instance(BufferManager, singleton=True, total_blocks=8192, read_ahead_blocks=0)
+            index = IndexManager(path, KEY_FORMAT, node_size)
+            begin = time.perf_counter()
+            for i, key in enumerate(keys):
+                index.insert([key], i)
+            insert = (time.perf_counter() - begin) / KEYS
+            begin = time.perf_counter()
+            for key in lookups:
+                index.find([key])
+            cached_find = (time.perf_counter() - begin) / LOOKUPS
+            levels = depth(index)
+            print('{:>10} {:>7} {:>6} {:>10.1f} {:>15.1f} {:>24}'.format(
+                node_size, index.Node.n, levels, insert * 1e6, cached_find * 1e6, levels * node_size // 1024))
+    BufferManager._instances.pop(BufferManager, None)
+
+
+if __name__ == '__main__':
+    main()
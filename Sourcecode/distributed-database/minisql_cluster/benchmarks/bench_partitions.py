@@ -0,0 +1,58 @@
+"""compare the hit ratio of the index nodes with and without a reserved index partition,
+on the mix of table scans and indexed point lookups of bench_replacement_policy, run against a real buffer
+with reserved={'index': share}, the blocks of a scan can't swap out the B+ tree nodes within that share
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_partitions"""
+import os
+import random
+import tempfile
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+
+POOL_BLOCKS = 1024
+INTERNAL_NODES = 64
+LEAF_NODES = 2048
+TABLE_BLOCKS = POOL_BLOCKS * 4
+LOOKUPS = 20000
+LOOKUPS_BETWEEN_SCANS = 500
+CONFIGURATIONS = (
+    ('lru', {}),
+    ('lru', {'index': 0.25}),
+    ('2q', {}),
+    ('2q', {'index': 0.25}),
+)
+
+
+def run(manager, table_path, index_path):
+    rng = random.Random(0)
+    for i in range(LOOKUPS):
+        if i % LOOKUPS_BETWEEN_SCANS == 0:
+            for block_offset in range(TABLE_BLOCKS):
+                manager.get_file_block(table_path, block_offset)
+        manager.get_file_block(index_path, 1)
+        manager.get_file_block(index_path, 2 + rng.randrange(INTERNAL_NODES))
+        manager.get_file_block(index_path, 2 + INTERNAL_NODES + int(rng.paretovariate(1.2)) % LEAF_NODES)
+        manager.get_file_block(table_path, int(rng.paretovariate(1.2)) % TABLE_BLOCKS)
+    return manager.stats
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        table_path = os.path.join(directory, 'big_table.table')
+        index_path = os.path.join(directory, 'PRIMARY.index')
+        with open(table_path, 'wb') as file:
+            file.truncate(BufferManager.block_size * TABLE_BLOCKS)
+        with open(index_path, 'wb') as file:
+            file.truncate(BufferManager.block_size * (2 + INTERNAL_NODES + LEAF_NODES))
+        print('{:>8} {:>16} {:>12} {:>16}'.format('policy', 'reserved index', 'hit ratio', 'index hit ratio'))
+        for policy, reserved in CONFIGURATIONS:
+            stats = run(new_instance(BufferManager, total_blocks=POOL_BLOCKS, replacement_policy=policy,
+                                             reserved=reserved), table_path, index_path)
+            print('{:>8} {:>16} {:>12.3f} {:>16.3f}'.format(policy, reserved.get('index', 0), stats['hit_ratio'],
+                                                            stats['files']['index']['hit_ratio']))
+
+
+if __name__ == '__main__':
+    main()
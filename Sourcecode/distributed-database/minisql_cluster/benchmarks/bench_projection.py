@@ -0,0 +1,50 @@
+"""measure a scan of a wide table returning all the columns against one returning two of them,
+with the records checked one by one and with numpy, and the size of the result written out like a select
+only the fields of the columns asked for, and those tested by the conditions, are unpacked and decoded
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_projection"""
+import os
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.record_manager import RecordManager
+
+FMT = '<1i32s1d1i64s1d1i32s'  # 8 columns, 3 of them char
+ROWS = 50000
+CONDITIONS = {2: {'<': 0.5}}  # half of the records
+COLUMNS = [0, 3]
+
+
+def run(columns):
+    begin = time.perf_counter()
+    size = 0
+    for record in RecordManager.select('wide', FMT, with_index=False, conditions=CONDITIONS, columns=columns):
+        size += len(' | '.join(str(item) for item in record)) + 1
+    return time.perf_counter() - begin, size
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        RecordManager.set_file_dir(directory + os.sep)
+        new_instance(BufferManager, singleton=True, manifest_path=None, total_blocks=4096)  # the table fits
+        RecordManager.init_table('wide')
+        RecordManager.insert_many('wide', FMT, [(i, 'name{}'.format(i), (i % 100) / 100, -i, 'text' * 16, i * 0.5,
+                                                 i % 7, 'tag{}'.format(i % 13)) for i in range(ROWS)])
+        record = RecordManager.open_table('wide', FMT)
+        dtype = record.dtype
+        print('{:>8} {:>10} {:>14} {:>16}'.format('scan', 'columns', 'ms', 'result KB'))
+        for record.dtype in (None, dtype):
+            scan = 'loop' if record.dtype is None else 'numpy'
+            for columns in (None, COLUMNS):
+                elapsed, size = run(columns)
+                print('{:>8} {:>10} {:>14.2f} {:>16.0f}'.format(scan, 'all' if columns is None else len(columns),
+                                                               elapsed * 1e3, size / 1024))
+            if dtype is None:  # numpy isn't installed
+                break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""measure a full sequential scan through BufferManager with different read-ahead windows
+a window of 1 issues one 4 KB pread() per block, a larger window one preadv() per window;
+the file is read once beforehand, so the page cache is warm and the syscall overhead is what is measured
+a random access pattern follows, to check that read-ahead stays off, i.e. nothing is prefetched in vain
+last, with 2q, hot index blocks are read a few times, then a scan of 4 times the pool runs, with and without
+read-ahead: a block read ahead is admitted by its first use, not accessed, so the scan doesn't evict the hot blocks
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_read_ahead"""
+import os
+import random
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+
+WINDOWS = (1, 8, 32, 128)
+FILE_BLOCKS = 32768  # 128 MB, larger than the pool, so that every scan misses
+POOL_BLOCKS = 4096
+HOT_BLOCKS = 64
+
+
+def bench(file_path, read_ahead_blocks):
+    manager = new_instance(BufferManager, total_blocks=POOL_BLOCKS, read_ahead_blocks=read_ahead_blocks)
+    begin = time.perf_counter()
+    for block_offset in range(FILE_BLOCKS):
+        manager.get_file_block(file_path, block_offset).read()
+    elapsed = time.perf_counter() - begin
+    scan_stats = dict(manager.stats)
+    manager.detach_from_file(file_path)
+    manager = new_instance(BufferManager, total_blocks=POOL_BLOCKS, read_ahead_blocks=read_ahead_blocks)
+    generator = random.Random(0)
+    for _ in range(FILE_BLOCKS // 4):
+        manager.get_file_block(file_path, generator.randrange(FILE_BLOCKS)).read()
+    manager.detach_from_file(file_path)
+    return elapsed, scan_stats, manager.stats
+
+
+def hot_blocks_kept(file_path, index_path, read_ahead_blocks):
+    manager = new_instance(BufferManager, total_blocks=POOL_BLOCKS, read_ahead_blocks=read_ahead_blocks,
+                           replacement_policy='2q')
+    for _ in range(3):
+        for block_offset in range(HOT_BLOCKS):
+            manager.get_file_block(index_path, block_offset).read()
+    for block_offset in range(POOL_BLOCKS * 4):
+        manager.get_file_block(file_path, block_offset).read()
+    # looked up in the shards, since reading them again would read ahead, and count the blocks read ahead as hits
+    file_id = manager.file_id(index_path)
+    kept = sum(1 for block_offset in range(HOT_BLOCKS)
+               if (file_id, block_offset) in manager._shard(file_id, block_offset).blocks)
+    manager.detach_from_file(file_path)
+    manager.detach_from_file(index_path)
+    return kept
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'bench.table')
+        with open(file_path, 'wb') as file:
+            file.write(os.urandom(BufferManager.block_size * FILE_BLOCKS))
+        index_path = os.path.join(directory, 'hot.index')
+        with open(index_path, 'wb') as file:
+            file.write(os.urandom(BufferManager.block_size * HOT_BLOCKS))
+        with open(file_path, 'rb') as file:  # warm the page cache
+            while file.read(1 << 20):
+                pass
+        size = BufferManager.block_size * FILE_BLOCKS / 1024 / 1024
+        print('{:>8} {:>10} {:>8} {:>12} {:>18}'.format('window', 'scan s', 'MB/s', 'prefetched',
+                                                        'unused (random)'))
+        for window in WINDOWS:
+            elapsed, scan_stats, random_stats = bench(file_path, window)
+            print('{:>8} {:>10.3f} {:>8.0f} {:>12} {:>18}'.format(
+                window, elapsed, size / elapsed, scan_stats['prefetched'], random_stats['prefetched_unused']))
+
+        print()
+        print('{:>8} {:>24}'.format('window', 'hot blocks kept (2q)'))
+        for window in (1, BufferManager.read_ahead_blocks):
+            print('{:>8} {:>24}'.format(window, '{}/{}'.format(hot_blocks_kept(file_path, index_path, window),
+                                                                HOT_BLOCKS)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""measure the time a region needs to recover after a crash, against the amount of log written
+without checkpoints the whole log is replayed, so the restart time grows with the log;
+with fuzzy checkpoints only the tail since the redo point is replayed, so it stays bounded
+a slow restart matters, since a region that stays down too long is re-replicated by copy_server()
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_recovery"""
+import os
+import random
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.log_manager import LogManager
+
+LOG_SIZES = (4, 16, 64, 256)  # MB of log written before the crash
+FILE_BLOCKS = 4096
+CHECKPOINT_LOG_SIZE = 8 * 1024 * 1024
+
+
+def crash_and_recover(directory, log_size, checkpoints):
+    file_path = os.path.join(directory, 'bench.table')
+    log_path = os.path.join(directory, 'wal.log')
+    for path in (file_path, log_path):
+        if os.path.exists(path):
+            os.remove(path)
+    with open(file_path, 'wb') as file:
+        file.truncate(BufferManager.block_size * FILE_BLOCKS)
+    log = new_instance(LogManager, log_path=log_path)
+    manager = new_instance(BufferManager, total_blocks=1024, checkpoint_log_size=CHECKPOINT_LOG_SIZE,
+                           manifest_path=None)
+    manager.attach_log(log)
+    generator = random.Random(0)
+    record = bytes(256)
+    tick = 1024 * 1024
+    while log.lsn < log_size:  # small updates of random blocks, like inserts into a table and its indexes
+        block = manager.get_file_block(file_path, generator.randrange(FILE_BLOCKS))
+        block.write_into(generator.randrange(BufferManager.block_size // len(record)) * len(record), record)
+        if checkpoints and log.lsn >= tick:  # what the flusher does every second
+            manager._flush_cold_blocks()
+            manager._checkpoint_if_due()
+            tick += 1024 * 1024
+    log.stop()  # the log is durable, the table file is left behind, as in a crash
+    replayed_size = log.size
+    os.close(log._fd)
+    begin = time.perf_counter()
+    new_instance(LogManager, log_path=log_path).recover()
+    return replayed_size, time.perf_counter() - begin
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        print('{:>10} {:>24} {:>24}'.format('', 'no checkpoint', 'fuzzy checkpoints'))
+        print('{:>10} {:>12} {:>11} {:>12} {:>11}'.format('logged MB', 'replayed MB', 'recover s',
+                                                          'replayed MB', 'recover s'))
+        for log_size in LOG_SIZES:
+            row = [log_size]
+            for checkpoints in (False, True):
+                replayed_size, elapsed = crash_and_recover(directory, log_size * 1024 * 1024, checkpoints)
+                row += [replayed_size / 1024 / 1024, elapsed]
+            print('{:>10} {:>12.1f} {:>11.3f} {:>12.1f} {:>11.3f}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""compare the hit ratio of the replacement policies on a mix of table scans and indexed point lookups
+a point lookup walks root -> internal node -> leaf of a B+ tree, then reads one table block;
+every few hundred lookups a full table scan, 4 times larger than the pool, touches each table block once
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_replacement_policy"""
+import random
+
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.replacer import replacers
+
+TABLE = 'big_table.table'
+INDEX = 'PRIMARY.index'
+INTERNAL_NODES = 64
+LEAF_NODES = 2048
+TABLE_BLOCKS = BufferManager.total_blocks * 4
+LOOKUPS = 100000
+LOOKUPS_BETWEEN_SCANS = 500
+
+
+def workload(seed=0):
+    """yield (key, is_index_inner_node)"""
+    rng = random.Random(seed)
+    for i in range(LOOKUPS):
+        if i % LOOKUPS_BETWEEN_SCANS == 0:
+            for block_offset in range(TABLE_BLOCKS):
+                yield (TABLE, block_offset), False
+        yield (INDEX, 1), True
+        yield (INDEX, 2 + rng.randrange(INTERNAL_NODES)), True
+        yield (INDEX, 2 + INTERNAL_NODES + int(rng.paretovariate(1.2)) % LEAF_NODES), False
+        yield (TABLE, int(rng.paretovariate(1.2)) % TABLE_BLOCKS), False
+
+
+def simulate(policy, capacity):
+    replacer = replacers[policy](capacity)
+    resident = set()
+    hits = accesses = inner_hits = inner_accesses = 0
+    for key, inner in workload():
+        accesses += 1
+        inner_accesses += inner
+        if key in resident:
+            hits += 1
+            inner_hits += inner
+            replacer.access(key)
+            continue
+        if len(resident) >= capacity:
+            resident.remove(replacer.evict(lambda k: True))
+        resident.add(key)
+        replacer.admit(key)
+    return hits / accesses, inner_hits / inner_accesses
+
+
+def main():
+    capacity = BufferManager.total_blocks
+    print('{:>8} {:>12} {:>22}'.format('policy', 'hit ratio', 'inner node hit ratio'))
+    for policy in replacers:
+        hit_ratio, inner_hit_ratio = simulate(policy, capacity)
+        print('{:>8} {:>12.3f} {:>22.3f}'.format(policy, hit_ratio, inner_hit_ratio))
+
+
+if __name__ == '__main__':
+    main()
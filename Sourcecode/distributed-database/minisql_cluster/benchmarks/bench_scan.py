@@ -0,0 +1,80 @@
+"""measure full scans of tables of growing size through RecordManager.select:
+the peak memory taken while the records are consumed one by one, against a scan collected into a list,
+the time of a scan filtered on an int, a char and a float column, and the time to read the first records,
+as with a LIMIT
+the scan is a generator reading a block at a time, so its memory doesn't grow with the table,
+and a LIMIT stops it after the blocks holding the first records;
+the conditions are compiled once into a predicate comparing the packed fields, decoding only the matches,
+and with numpy the records of a batch of blocks are tested at once, as an array, against the per-record loop
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_scan"""
+import itertools
+import os
+import tempfile
+import time
+import tracemalloc
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.record_manager import RecordManager
+
+FMT = '<i20sf'
+TABLE_ROWS = (10000, 50000, 200000)
+LIMIT = 10
+CONDITIONS = {0: {'>=': 1000}, 1: {'=': 'name4321'}, 2: {'<': 1e9}}  # a single match, every record is checked
+NUMERIC_CONDITIONS = {0: {'>': 1000}, 2: {'<': 2000.0}}  # an int and a float column, 333 records
+
+
+def peak_memory(consume):
+    tracemalloc.start()
+    consume()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        RecordManager.set_file_dir(directory + os.sep)
+        print('{:>10} {:>16} {:>16} {:>14} {:>14} {:>12} {:>14} {:>14}'.format(
+            'rows', 'streamed peak KB', 'list peak KB', 'full scan ms', 'filtered ms', 'limit {} ms'.format(LIMIT),
+            'numeric loop', 'numeric numpy'))
+        for rows in TABLE_ROWS:
+            new_instance(BufferManager, singleton=True, manifest_path=None)
+            table_name = 'bench{}'.format(rows)
+            RecordManager.init_table(table_name)
+            RecordManager.insert_many(table_name, FMT, [(i, 'name{}'.format(i), i * 1.5) for i in range(rows)])
+
+            def scan(conditions=None):
+                return RecordManager.select(table_name, FMT, with_index=False, conditions=conditions or {})
+
+            def stream(conditions=None):
+                for _ in scan(conditions):
+                    pass
+
+            streamed = peak_memory(stream)
+            listed = peak_memory(lambda: list(scan()))
+            begin = time.perf_counter()
+            stream()
+            full_scan = time.perf_counter() - begin
+            begin = time.perf_counter()
+            stream(CONDITIONS)
+            filtered = time.perf_counter() - begin
+            begin = time.perf_counter()
+            list(itertools.islice(scan(), LIMIT))
+            limited = time.perf_counter() - begin
+            record = RecordManager.open_table(table_name, FMT)
+            dtype = record.dtype
+            numeric = []
+            for record.dtype in (None, dtype):  # without numpy, the records are checked one by one
+                begin = time.perf_counter()
+                stream(NUMERIC_CONDITIONS)
+                numeric.append(time.perf_counter() - begin)
+            print('{:>10} {:>16.0f} {:>16.0f} {:>14.2f} {:>14.2f} {:>12.3f} {:>14.2f} {:>14}'.format(
+                rows, streamed / 1024, listed / 1024, full_scan * 1e3, filtered * 1e3, limited * 1e3,
+                numeric[0] * 1e3, '-' if dtype is None else '{:.2f}'.format(numeric[1] * 1e3)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""measure deletes and updates scanning a table through RecordManager, matching a single record,
+the records of a few blocks and every record, with the time taken and the blocks of the buffer left dirty,
+i.e. to be written back by the next flush
+only the slots of the records matched are written, so the blocks without any match stay clean
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_scan_write"""
+import os
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.record_manager import RecordManager
+
+FMT = '<i20sf'
+ROWS = 50000
+CASES = (
+    ('one record', {0: {'=': ROWS // 2}}),
+    ('1% of them', {0: {'<': ROWS // 100}}),
+    ('all', {0: {'>=': 0}}),
+)
+
+
+def run(operation, table_name, conditions):
+    manager = new_instance(BufferManager, singleton=True, manifest_path=None, total_blocks=4096)  # the table fits
+    RecordManager.init_table(table_name)
+    RecordManager.insert_many(table_name, FMT, [(i, 'name{}'.format(i), i * 1.5) for i in range(ROWS)])
+    RecordManager.flush_headers()
+    manager.flush_all()
+    begin = time.perf_counter()
+    if operation == 'delete':
+        RecordManager.delete(table_name, FMT, with_index=False, conditions=conditions)
+    else:
+        RecordManager.update(table_name, FMT, (-1, 'updated', 0.0), with_index=False, conditions=conditions)
+    elapsed = time.perf_counter() - begin
+    return elapsed, manager.stats['dirty'], manager.stats['cached']
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        RecordManager.set_file_dir(directory + os.sep)
+        print('{:>8} {:>12} {:>10} {:>14} {:>14}'.format('', 'matching', 'ms', 'dirty blocks', 'table blocks'))
+        for operation in ('delete', 'update'):
+            for number, (name, conditions) in enumerate(CASES):
+                elapsed, dirty, cached = run(operation, '{}{}'.format(operation, number), conditions)
+                print('{:>8} {:>12} {:>10.2f} {:>14} {:>14}'.format(operation, name, elapsed * 1e3, dirty, cached))
+
+
+if __name__ == '__main__':
+    main()
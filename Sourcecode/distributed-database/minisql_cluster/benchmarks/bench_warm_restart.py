@@ -0,0 +1,61 @@
+"""measure the latency of the first lookups after a restart, with a cold buffer and with a buffer
+warmed up from the manifest written before the restart
+the files are in the page cache either way, so a miss costs a read() rather than a seek; on disks, the gap widens
+
+run from Sourcecode/distributed-database:
+    python -m minisql_cluster.benchmarks.bench_warm_restart"""
+import os
+import random
+import tempfile
+import time
+
+from minisql_cluster.benchmarks.common import new_instance
+from minisql_cluster.src.buffer_manager import BufferManager
+
+POOL_BLOCKS = 4096
+FILE_BLOCKS = 65536
+HOT_BLOCKS = 3072  # the working set, scattered over the file, fits in the buffer
+LOOKUPS = 20000
+
+
+def lookups(seed):
+    hot_blocks = random.Random(0).sample(range(FILE_BLOCKS), HOT_BLOCKS)
+    generator = random.Random(seed)
+    return [generator.choice(hot_blocks) for _ in range(LOOKUPS)]
+
+
+def measure(manager, file_path, block_offsets):
+    latencies = []
+    for block_offset in block_offsets:
+        begin = time.perf_counter()
+        with manager.pinned(file_path, block_offset) as block:
+            block.read()
+        latencies.append(time.perf_counter() - begin)
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[len(latencies) * 99 // 100], manager.stats['hit_ratio']
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'bench.table')
+        manifest_path = os.path.join(directory, 'buffer.manifest')
+        with open(file_path, 'wb') as file:
+            file.truncate(BufferManager.block_size * FILE_BLOCKS)
+        manager = new_instance(BufferManager, total_blocks=POOL_BLOCKS, manifest_path=manifest_path)
+        measure(manager, file_path, lookups(0))  # the workload before the restart
+        manager.save_manifest()
+
+        print('{:>12} {:>12} {:>12} {:>12} {:>12}'.format('', 'warm-up s', 'mean us', 'p99 us', 'hit ratio'))
+        for warm in (False, True):
+            manager = new_instance(BufferManager, total_blocks=POOL_BLOCKS, manifest_path=manifest_path)
+            begin = time.perf_counter()
+            if warm:
+                manager.warm_up(background=False)
+            warm_up = time.perf_counter() - begin
+            mean, p99, hit_ratio = measure(manager, file_path, lookups(1))
+            print('{:>12} {:>12.3f} {:>12.2f} {:>12.2f} {:>12.3f}'.format(
+                'warm' if warm else 'cold', warm_up, mean * 1e6, p99 * 1e6, hit_ratio))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+"""helpers shared by the benchmarks"""
+from minisql_cluster.src.buffer_manager import SingletonMeta
+
+
+def new_instance(cls, singleton=False, **attributes):
+    """create an instance of a singleton class afresh, with attributes set before __init__ runs,
+    e.g. new_instance(BufferManager, total_blocks=64, manifest_path=None)
+    if singleton, it replaces the instance returned by cls(), for RecordManager and IndexManager use that one"""
+    instance = object.__new__(cls)  # bypass the singleton, every run starts afresh
+    for name, value in attributes.items():
+        setattr(instance, name, value)
+    instance.__init__()
+    if singleton:
+        SingletonMeta._instances[cls] = instance
+    return instance
@@ -1,6 +1,32 @@
-from datetime import datetime
 import os
-from contextlib import contextmanager
+import mmap
+import threading
+import time
+from itertools import count
+from collections import OrderedDict, Counter
+from contextlib import contextmanager, ExitStack
+from struct import Struct, error as StructError
+
+from minisql_cluster.src.replacer import create_replacer
+
+# a logical clock shared by all blocks; cheaper than datetime.now() and strictly monotonic
+_access_clock = count()
+# the most buffers a single pwritev() accepts
+_iov_max = os.sysconf('SC_IOV_MAX') if 'SC_IOV_MAX' in os.sysconf_names else 1024
+# blocks are assigned to the shards of the buffer by extents of 2 ** _extent_shift blocks
+_extent_shift = 6
+# the counters of BufferManager.stats, kept for every kind of file, i.e. 'table', 'index' or 'other'
+_stat_names = ('hits', 'misses', 'evictions', 'dirty_evictions', 'prefetched', 'prefetched_unused',
+               'flushed_blocks', 'flush_writes', 'flush_seconds', 'flush_max_seconds')
+
+
+def parse_size(size):
+    """the number of bytes of a size such as 4096, '64K', '256M' or '2G'"""
+    size = str(size).strip().upper()
+    for suffix, shift in (('K', 10), ('M', 20), ('G', 30)):
+        if size.endswith(suffix):
+            return int(float(size[:-1]) * (1 << shift))
+    return int(size)
 
 
 @contextmanager
@@ -12,34 +38,169 @@ def pin(block):
     block.unpin()
 
 
+class FilePool:
+    """a bounded pool of open file descriptors keyed by absolute path
+    blocks are read and written with positional I/O, so a descriptor is shared without any seek
+    the least recently used idle descriptor is closed when the pool is full
+    a descriptor is leased for the duration of every I/O, so it is never closed, and its number
+    never reused, while another thread (e.g. the background flusher) is still using it"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._fds = OrderedDict()  # abs_path -> [fd, number of leases]
+        self._unsynced = set()  # paths written since the last sync_all()
+        self._lock = threading.Lock()
+
+    def _lease(self, abs_path):
+        with self._lock:
+            entry = self._fds.get(abs_path)
+            if entry is None:
+                entry = [os.open(abs_path, os.O_RDWR), 0]  # raise FileNotFoundError just like open()
+                self._fds[abs_path] = entry
+                self._close_idle()
+            else:
+                self._fds.move_to_end(abs_path)
+            entry[1] += 1
+            return entry
+
+    def _release(self, abs_path, entry):
+        with self._lock:
+            entry[1] -= 1
+            if entry[1] == 0 and self._fds.get(abs_path) is not entry:  # closed while leased
+                os.close(entry[0])
+
+    def _close_idle(self):
+        if len(self._fds) > self.capacity:
+            for abs_path in [path for path, entry in self._fds.items() if entry[1] == 0]:
+                os.close(self._fds.pop(abs_path)[0])
+                if len(self._fds) <= self.capacity:
+                    break
+
+    @contextmanager
+    def open(self, abs_path):
+        """lease an open descriptor of the file"""
+        entry = self._lease(abs_path)
+        try:
+            yield entry[0]
+        finally:
+            self._release(abs_path, entry)
+
+    def read_into(self, abs_path, position, buffer):
+        """fill buffer with the file content from position, return the number of bytes read"""
+        return self.read_vectored(abs_path, position, [buffer])
+
+    def read_vectored(self, abs_path, position, buffers):
+        """fill the buffers one after another with the file content from position with a single syscall,
+        return the number of bytes read, which is less than requested only at the end of the file"""
+        entry = self._lease(abs_path)
+        try:
+            return os.preadv(entry[0], buffers[:_iov_max], position)
+        finally:
+            self._release(abs_path, entry)
+
+    def write(self, abs_path, position, data):
+        self.write_vectored(abs_path, position, [data])
+
+    def sync_all(self):
+        """fsync every file written since the last sync, even if its descriptor has been closed"""
+        with self._lock:
+            unsynced, self._unsynced = self._unsynced, set()
+        for abs_path in unsynced:
+            try:
+                with self.open(abs_path) as fd:
+                    os.fsync(fd)
+            except FileNotFoundError:
+                pass
+
+    def write_vectored(self, abs_path, position, buffers):
+        """write the buffers one after another from position with as few syscalls as possible"""
+        entry = self._lease(abs_path)
+        try:
+            buffers = [memoryview(buffer) for buffer in buffers]
+            while buffers:
+                written = os.pwritev(entry[0], buffers[:_iov_max], position)
+                position += written
+                while buffers and written >= len(buffers[0]):  # drop what is written, handle short writes
+                    written -= len(buffers.pop(0))
+                if written:
+                    buffers[0] = buffers[0][written:]
+        finally:
+            # marked once the write is done, under the lock sync_all() swaps the set with,
+            # so that a sync taken meanwhile either covers the write or leaves the file to the next one
+            with self._lock:
+                self._unsynced.add(abs_path)
+            self._release(abs_path, entry)
+
+    def close(self, abs_path):
+        with self._lock:
+            self._unsynced.discard(abs_path)
+            entry = self._fds.pop(abs_path, None)
+            if entry is not None and entry[1] == 0:
+                os.close(entry[0])
+
+    def close_all(self):
+        with self._lock:
+            for entry in self._fds.values():
+                if entry[1] == 0:
+                    os.close(entry[0])
+            self._fds.clear()
+
+
 class Block:
-    __slots__ = ['size', '_memory',
-                 'file_path', 'block_offset', 'effective_bytes',
-                 'dirty', 'pin_count', 'last_accessed_time']
-
-    def __init__(self, size, file_path, block_offset):
-        self.size = size
-        self._memory = bytearray(size)
-        self.file_path = os.path.abspath(file_path)
+    """a page of a file cached in a frame, i.e. a fixed slot of the buffer arena
+    once the block is swapped out, the frame is handed to another block and this object must not be used
+
+    pin_count is guarded by the latch of the shard holding the block, so that pinning and swapping out exclude
+    each other, and the shard counts its pinned blocks; the content of the frame is guarded by the latch
+    of the frame, held by every change and every write-back, so that a block is never written back halfway
+    through a change that isn't logged yet
+    read() takes no latch: a reader that may run while another thread changes the block holds block.latch
+    as long as it uses the view, or it may see a change halfway through"""
+    __slots__ = ['size', '_memory', '_files', '_log', '_shard', 'latch', 'frame',
+                 'file_id', 'file_path', 'block_offset', 'effective_bytes',
+                 'dirty', 'pin_count', 'last_accessed', 'rec_lsn', 'page_lsn', 'prefetched',
+                 'read_ahead']
+
+    def __init__(self, memory, frame, file_id, file_path, block_offset, files, shard, log=None, loaded=None,
+                 latch=None):
+        self.size = len(memory)
+        self._memory = memory
+        self._files = files
+        self._shard = shard
+        self.latch = latch or threading.RLock()
+        self._log = log  # every change is appended to the write-ahead log, if there is one
+        self.rec_lsn = 0  # where the changes since the block was last clean begin in the log
+        self.page_lsn = 0  # the lsn of the last change, the log must be durable up to it before a flush
+        self.frame = frame
+        self.file_id = file_id
+        self.file_path = file_path
         self.block_offset = block_offset
-        with open(file_path, 'rb') as file:
-            file.seek(self.size * block_offset)
-            # the remaining data in the file may not be enough to fill the whole block
-            # self.effective_bytes store how many bytes are really loaded into memory,
-            # which may be updated in future writes
-            # it is ultimately used to determine how many bytes are written back to file, in self.flush()
-            self.effective_bytes = file.readinto(self._memory)
+        # the remaining data in the file may not be enough to fill the whole block
+        # self.effective_bytes store how many bytes are really loaded into memory,
+        # which may be updated in future writes
+        # it is ultimately used to determine how many bytes are written back to file, in self.flush()
+        if loaded is None:
+            self.effective_bytes = files.read_into(file_path, self.size * block_offset, memory)
+        else:  # already read into the frame, along with its neighbours, by a read-ahead
+            self.effective_bytes = loaded
+        if self.effective_bytes < self.size:  # clear what the previous owner of the frame left
+            memory[self.effective_bytes:] = bytes(self.size - self.effective_bytes)
 
         self.dirty = False
         self.pin_count = 0
+        self.prefetched = False  # loaded by a read-ahead or a warm-up and not requested yet
+        self.read_ahead = False  # loaded by a read-ahead and not requested yet
 
-        self.last_accessed_time = datetime.now()
+        self.last_accessed = next(_access_clock)
 
     def read(self):
-        """read a block of data from memory"""
-        # update last accessed time to support LRU swap algorithm
-        self.last_accessed_time = datetime.now()
-        return self._memory[:self.effective_bytes]
+        """return a read-only view of the data in memory, without copying it
+        the view is only meaningful while the block is pinned;
+        copy it, e.g. with bytes(), if the data is needed afterwards
+        no latch is taken: hold self.latch while using the view if another thread may change the block"""
+        # record the access tick to support LRU swap algorithm
+        self.last_accessed = next(_access_clock)
+        return memoryview(self._memory)[:self.effective_bytes].toreadonly()
 
     def write(self, data, *, trunc=False):
         """write data into memory and adjust self.effective_bytes
@@ -49,49 +210,206 @@ class Block:
         if data_size > self.size:
             if not trunc:
                 raise RuntimeError('data size({}B) is larger than block size({}B)'.format(data_size, self.size))
-        self.effective_bytes = min(data_size, self.size)
-        self._memory[:self.effective_bytes] = data[:self.effective_bytes]
+        with self.latch:
+            self.effective_bytes = min(data_size, self.size)
+            self._memory[:self.effective_bytes] = data[:self.effective_bytes]
+            self._touch(0, self.effective_bytes)
+
+    def write_into(self, offset, data):
+        """overwrite part of the block in place, from offset, and mark it dirty
+        self.effective_bytes is extended if the data goes beyond it"""
+        end = offset + len(data)
+        if end > self.size:
+            raise RuntimeError('data end({}B) is beyond block size({}B)'.format(end, self.size))
+        with self.latch:
+            self._memory[offset:end] = data
+            self._touch(offset, end)
+
+    def pack_into(self, struct, offset, *values):
+        """pack values with struct into the block in place, from offset, and mark it dirty"""
+        with self.latch:
+            struct.pack_into(self._memory, offset, *values)
+            self._touch(offset, offset + struct.size)
+
+    def _touch(self, begin, end):
+        """bytes from begin to end are changed; the caller holds the latch"""
+        if end > self.effective_bytes:
+            self.effective_bytes = end
+        if self._log is not None:
+            if not self.dirty:
+                self.rec_lsn = self._log.lsn
+            self.page_lsn = self._log.append(self.file_path, self.block_offset * self.size + begin,
+                                             bytes(self._memory[begin:end]))
         self.dirty = True
-        self.last_accessed_time = datetime.now()
+        self.last_accessed = next(_access_clock)
 
     def flush(self):
         """write data from memory to file"""
-        if self.dirty:
-            try:
-                with open(self.file_path, 'r+b') as file:
-                    file.seek(self.block_offset * self.size)
-                    file.write(self._memory[:self.effective_bytes])
-                    file.flush()
+        if not self.dirty:  # a clean block, e.g. a victim of a scan, is skipped without latching it
+            return
+        with self.latch:
+            if self.dirty:
                 self.dirty = False
-                self.last_accessed_time = datetime.now()
-            except FileNotFoundError:
-                pass  # suppress this exception
-                # based on the assumption that the file won't magically disappear
-                # unless the table or index file is deleted from our application
-                # in which case flush should just do nothing
-                # because it may be a block remained in the buffer manager
-                # and this flush is most likely to occur when the buffer manager invokes flush_all()
-                # or tries to swap out this block
-                # in either case, it will be the end of the life cycle of this block
+                try:
+                    if self._log is not None:
+                        self._log.flush_to(self.page_lsn)
+                    self._files.write(self.file_path, self.block_offset * self.size,
+                                      memoryview(self._memory)[:self.effective_bytes])
+                except FileNotFoundError:
+                    pass  # suppress this exception
+                    # based on the assumption that the file won't magically disappear
+                    # unless the table or index file is deleted from our application
+                    # in which case flush should just do nothing
+                    # because it may be a block remained in the buffer manager
+                    # and this flush is most likely to occur when the buffer manager invokes flush_all()
+                    # or tries to swap out this block
+                    # in either case, it will be the end of the life cycle of this block
+                except BaseException:
+                    self.dirty = True
+                    raise
 
     def pin(self):
         """pin this block so that it cannot be released"""
-        self.pin_count += 1
+        shard = self._shard
+        with shard.latch:
+            if self.pin_count == 0:
+                shard.pinned += 1
+                if shard.pinned > shard.pinned_high_water:
+                    shard.pinned_high_water = shard.pinned
+            self.pin_count += 1
 
     def unpin(self):
         """unpin this block so that it can be released"""
-        if self.pin_count > 0:
-            self.pin_count -= 1
-        else:
-            raise RuntimeError('this block is already unpinned')
+        with self._shard.latch:
+            if self.pin_count > 0:
+                self.pin_count -= 1
+                if self.pin_count == 0:
+                    self._shard.pinned -= 1
+            else:
+                raise RuntimeError('this block is already unpinned')
+
+
+class MappedBlock(Block):
+    """a block whose memory is a window into a memory-mapped file instead of a private copy
+    read() hands out a read-only view of the mapping and write() stores straight into it,
+    so the OS page cache, rather than the buffer, keeps the data and writes it back"""
+    __slots__ = []
+
+    def __init__(self, window, file_id, file_path, block_offset, shard, log=None):
+        self.size = len(window)
+        self._memory = window
+        self._files = None
+        self._shard = shard
+        self.latch = threading.RLock()
+        # the OS may write a mapped page back before the log, which is harmless for a redo-only log
+        self._log = log
+        self.rec_lsn = 0
+        self.page_lsn = 0
+        self.frame = None  # no frame of the arena is occupied
+        self.file_id = file_id
+        self.file_path = file_path
+        self.block_offset = block_offset
+        self.effective_bytes = self.size  # only blocks lying entirely inside the file are mapped
+        self.dirty = False
+        self.pin_count = 0
+        self.prefetched = False
+        self.read_ahead = False
+        self.last_accessed = next(_access_clock)
+
+    def flush(self):
+        # the data is already in the page cache; MappedFile.flush() is what forces it to disk
+        self.dirty = False
+
+
+class BlockSpan:
+    """consecutive blocks of a file used as a single page larger than a block, e.g. a node of a B+ tree
+    the blocks stay ordinary blocks of the buffer, loaded together with a single vectored read,
+    so the frames keep one size while pages of any number of blocks are supported"""
+    __slots__ = ['blocks', 'block_offset', 'size']
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.block_offset = blocks[0].block_offset
+        self.size = sum(block.size for block in blocks)
+
+    def read(self):
+        """return a copy of the data of the whole span, since the frames of the blocks are apart in memory
+        as with Block.read(), no latch is taken"""
+        for block in self.blocks:
+            block.last_accessed = next(_access_clock)
+        return b''.join(block._memory for block in self.blocks)
+
+    def write(self, data, *, trunc=False):
+        """write data over the blocks of the span, leaving the blocks whose data is unchanged clean, so that
+        a change of a large node logs and writes back only the blocks it touches"""
+        if len(data) > self.size and not trunc:
+            raise RuntimeError('data size({}B) is larger than span size({}B)'.format(len(data), self.size))
+        begin = 0
+        for block in self.blocks:
+            chunk = data[begin:begin + block.size]
+            begin += block.size
+            if len(chunk) != block.effective_bytes or block._memory[:len(chunk)] != chunk:
+                block.write(chunk)
+
+    def pin(self):
+        for block in self.blocks:
+            block.pin()
+
+    def unpin(self):
+        for block in self.blocks:
+            block.unpin()
+
+
+class MappedFile:
+    """a table or index file mapped into memory in segments of segment_blocks blocks
+    a segment covers only the blocks lying entirely inside the file at the time it is mapped;
+    after the file grows, e.g. a record is appended or an index node is allocated,
+    the segment is mapped again to cover the new blocks
+    views taken from an old mapping stay valid, since all mappings share the same page cache"""
+    segment_blocks = 256
+
+    def __init__(self, abs_path, block_size, files):
+        self.abs_path = abs_path
+        self.block_size = block_size
+        self._files = files
+        with self._files.open(abs_path):  # raise FileNotFoundError early, just like Block
+            pass
+        self._segments = {}  # segment number -> (mmap, number of blocks mapped)
+        self._lock = threading.Lock()  # the blocks of a file may belong to different shards
+
+    def window(self, block_offset):
+        """return a writable view of the block, or None if the block is not entirely inside the file"""
+        segment_number, local_offset = divmod(block_offset, self.segment_blocks)
+        with self._lock:
+            segment = self._segments.get(segment_number)
+            if segment is None or local_offset >= segment[1]:
+                first_block = segment_number * self.segment_blocks
+                with self._files.open(self.abs_path) as fd:
+                    blocks = min(self.segment_blocks, os.fstat(fd).st_size // self.block_size - first_block)
+                    if local_offset >= blocks:
+                        return None
+                    mapping = mmap.mmap(fd, blocks * self.block_size, offset=first_block * self.block_size)
+                segment = (mapping, blocks)
+                self._segments[segment_number] = segment
+        begin = local_offset * self.block_size
+        return memoryview(segment[0])[begin:begin + self.block_size]
+
+    def flush(self):
+        with self._lock:
+            segments = list(self._segments.values())
+        for mapping, _ in segments:
+            mapping.flush()
 
 
 class SingletonMeta(type):
     _instances = {}
+    _lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
-            cls._instances[cls] = super(SingletonMeta, cls).__call__(*args, **kwargs)
+            with SingletonMeta._lock:  # two threads must not both create the instance
+                if cls not in cls._instances:
+                    cls._instances[cls] = super(SingletonMeta, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
 
 
@@ -99,48 +417,916 @@ class Singleton(metaclass=SingletonMeta):
     pass
 
 
+class _Shard:
+    """a partition of the buffer: a block table, a share of the frames and a replacer, under one latch"""
+
+    def __init__(self, frames, policy, file_partitions):
+        self.latch = threading.RLock()
+        self.blocks = {}  # (file id, block offset) -> block
+        self.file_blocks = {}  # file id -> offsets of its blocks in the shard, so a file is dropped without a scan
+        self.file_partitions = file_partitions  # file id -> its partition of the buffer, or None; shared by the shards
+        self.partition_blocks = Counter()  # partition -> number of its blocks in the shard
+        self.capacity = len(frames)  # the number of blocks the shard holds at most
+        # the frames of the shard; above the capacity only after a shrink, until the frames in use are freed
+        self.frame_count = len(frames)
+        self.free_frames = list(reversed(frames))
+        self.replacer = create_replacer(policy, self.capacity)
+        self.flushing = set()  # keys of the blocks being written back without the latch
+        self.flushed = threading.Condition(self.latch)  # notified whenever such a write-back finishes
+        self.stats = Counter()  # (kind of file, name) -> value, see BufferManager.stats
+        self.pinned = 0  # blocks with a pin_count above 0
+        self.pinned_high_water = 0
+
+    def add(self, key, block):
+        self.blocks[key] = block
+        self.file_blocks.setdefault(key[0], set()).add(key[1])
+        partition = self.file_partitions[key[0]]
+        if partition is not None:
+            self.partition_blocks[partition] += 1
+        self.replacer.admit(key)
+
+    def remove(self, key):
+        """remove a block from the block table and return it; the caller removes it from the replacer"""
+        block = self.blocks.pop(key)
+        offsets = self.file_blocks[key[0]]
+        offsets.discard(key[1])
+        if not offsets:
+            del self.file_blocks[key[0]]
+        partition = self.file_partitions[key[0]]
+        if partition is not None:
+            self.partition_blocks[partition] -= 1
+        return block
+
+    def limit(self, share):
+        """the number of blocks of a share of the shard"""
+        return max(1, int(self.capacity * share))
+
+
 class BufferManager(Singleton):
     block_size = 4096
     total_blocks = 1024
+    # 'lru', or '2q' to keep blocks touched once by sequential scans from evicting hot index nodes
+    replacement_policy = 'lru'
+    max_open_files = 64
+    # 'pread' copies blocks into private memory; 'mmap' maps table and index files instead,
+    # which suits read-mostly regions whose files fit in RAM
+    storage = 'pread'
+    # the background flusher, once started, writes dirty blocks back, coldest first, whenever more than
+    # dirty_high_watermark of the buffer is dirty, until no more than dirty_low_watermark is
+    dirty_high_watermark = 0.5
+    dirty_low_watermark = 0.25
+    flush_interval = 1.0  # seconds between two checks of the flusher
+    # with a write-ahead log attached, the flusher also takes a fuzzy checkpoint every checkpoint_interval seconds,
+    # or as soon as the log to be replayed grows beyond checkpoint_log_size bytes
+    checkpoint_interval = 60.0
+    checkpoint_log_size = 64 * 1024 * 1024
+    # once a file is read sequentially, e.g. by a table scan, a miss loads up to read_ahead_blocks blocks
+    # with a single vectored read; 0 disables the read-ahead
+    read_ahead_blocks = 32
+    # the buffer can be split into shards, each with its own latch, block table, frames and replacer,
+    # so that threads working on different blocks rarely wait for each other
+    # as with the buffer pool instances of InnoDB, a block goes to a shard by its extent of 64 blocks,
+    # so that a read-ahead stays within one shard; a shard has 64 frames at least
+    # a single shard by default: the gil serializes most of the work done under the latch,
+    # so bench_concurrent_reads gains little from more shards, while every shard gets a slice of the quotas,
+    # the replacer and the frames; set e.g. MINISQL_BUFFER_SHARD_COUNT=16 where it measures better
+    shard_count = 1
+    # the buffer can be split into partitions, each of which is a file, by its name such as 'orders.table',
+    # or else a kind of file, 'table' or 'index'
+    # quotas caps the share of every shard the blocks of a partition take, e.g. {'orders.table': 0.5},
+    # and reserved keeps a share of every shard for a partition, whose blocks the blocks of other partitions
+    # don't swap out, e.g. {'index': 0.25} keeps the nodes of the B+ trees resident while large tables are scanned
+    # both are best effort: when nothing else can be swapped out, e.g. everything else is pinned, they give way
+    quotas = {}
+    reserved = {}
+    # the blocks cached are listed, hottest first, in a manifest on every checkpoint and on quit,
+    # so that a restarted region reloads them in bulk with warm_up() instead of missing them one by one
+    manifest_path = 'schema/buffer.manifest'
+    manifest_header = Struct('<II')  # number of files, number of blocks
+    manifest_path_struct = Struct('<H')  # length of the path of a file, followed by the path
+    manifest_entry = Struct('<Ii')  # index of the file, block offset
+
+    @classmethod
+    def configure(cls, environ=None):
+        """set the class attributes from the environment, which must happen before the buffer is created
+        MINISQL_BUFFER_SIZE sets the size of the buffer in bytes, with an optional suffix K, M or G, e.g. 256M;
+        any other attribute is set by MINISQL_BUFFER_ followed by its name in upper case,
+        e.g. MINISQL_BUFFER_REPLACEMENT_POLICY=2q, the quotas and reserved shares as comma-separated
+        partition=share pairs, e.g. MINISQL_BUFFER_RESERVED=index=0.25
+        block_size is left alone, since it is the page size of the table and index files"""
+        environ = os.environ if environ is None else environ
+        for name in ('total_blocks', 'replacement_policy', 'max_open_files', 'storage',
+                     'dirty_high_watermark', 'dirty_low_watermark', 'flush_interval',
+                     'checkpoint_interval', 'checkpoint_log_size', 'read_ahead_blocks', 'shard_count',
+                     'quotas', 'reserved'):
+            value = environ.get('MINISQL_BUFFER_' + name.upper())
+            if value is None:
+                continue
+            current = getattr(cls, name)
+            if isinstance(current, dict):
+                value = {partition.strip(): float(share)
+                         for partition, share in (pair.split('=') for pair in value.split(',') if pair.strip())}
+            elif name == 'checkpoint_log_size':
+                value = parse_size(value)
+            else:
+                value = type(current)(value)
+            setattr(cls, name, value)
+        size = environ.get('MINISQL_BUFFER_SIZE')
+        if size is not None:
+            cls.total_blocks = max(1, parse_size(size) // cls.block_size)
 
     def __init__(self):
-        self._blocks = {}
+        # the frames are carved out of preallocated arenas, so a miss allocates no memory for data
+        # and the size of the buffer is known in advance; a resize adds an arena or gives up frames
+        self._arenas = []  # [arena, number of its frames not given up]
+        self._frames = []  # frame -> its memory in an arena, None once given up
+        self._frame_arenas = []  # frame -> index of its arena
+        self._frame_latches = []
+        self._arena_lock = threading.Lock()
+        self._resize_lock = threading.Lock()
+        frames = self._new_frames(self.total_blocks)
+        shard_count = max(1, min(self.shard_count, self.total_blocks >> _extent_shift))
+        bounds = [i * self.total_blocks // shard_count for i in range(shard_count + 1)]
+        # every file is interned as a small integer; _file_ids also maps the paths given by the callers,
+        # relative or not, so that a hit needs no os.path.abspath(); the working directory never changes
+        self._file_ids = {}
+        self._file_paths = []  # file id -> absolute path
+        self._file_kinds = []  # file id -> 'table', 'index' or 'other', by the extension of the file
+        self._file_partitions = []  # file id -> its partition of the buffer, or None
+        self._shards = [_Shard(frames[bounds[i]:bounds[i + 1]], self.replacement_policy, self._file_partitions)
+                        for i in range(shard_count)]
+        self._files = FilePool(self.max_open_files)
+        self._mapped_files = {}
+        self._catalog_lock = threading.Lock()  # guards the interning of files, the mapped files and the flusher
+        self._log = None
+        self._flusher = None  # (thread, stop event)
+        self._flusher_wakeup = threading.Event()
+        self._checkpoint_lsn = 0  # where the log was when the last checkpoint began
+        self._checkpoint_time = time.monotonic()
+        self._next_miss = {}  # file id -> the block offset that continues the last miss sequentially
+        # the write-backs run outside the latches of the shards, so their counters are kept apart
+        self._flush_stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """a snapshot of the counters of the buffer since it was created, as a dict of plain numbers
+        hits, misses (the first use of a block read ahead among them), evictions (dirty_evictions of them
+        written back first), prefetched blocks read ahead or warmed up (prefetched_unused of them swapped out
+        before any use), flushed_blocks written back with flush_writes writes, taking flush_seconds in total
+        and flush_max_seconds at most, and hit_ratio, for the whole buffer,
+        and under 'files' for table and index files apart
+        the counters are bumped under the latches already held, so keeping them costs next to nothing
+        the gauges capacity, cached, dirty and pinned are the current numbers of blocks; pinned_high_water is
+        the sum of the high-water marks of the shards, which bounds the high-water mark of the whole buffer;
+        'partitions' holds the number of blocks cached of every partition, see quotas"""
+        counters = Counter()
+        partitions = Counter()  # partition -> cached blocks
+        gauges = dict.fromkeys(('capacity', 'cached', 'dirty', 'pinned', 'pinned_high_water'), 0)
+        for shard in self._shards:
+            with shard.latch:
+                counters.update(shard.stats)
+                gauges['capacity'] += shard.capacity
+                gauges['cached'] += len(shard.blocks)
+                gauges['dirty'] += sum(1 for block in shard.blocks.values() if block.dirty)
+                gauges['pinned'] += shard.pinned
+                gauges['pinned_high_water'] += shard.pinned_high_water
+                partitions.update(shard.partition_blocks)
+        with self._stats_lock:
+            counters.update(self._flush_stats)
+        files = {}
+        for (kind, name), value in counters.items():
+            files.setdefault(kind, dict.fromkeys(_stat_names, 0))[name] = value
+        stats = dict.fromkeys(_stat_names, 0)
+        for file_stats in files.values():
+            for name, value in file_stats.items():
+                if name == 'flush_max_seconds':
+                    stats[name] = max(stats[name], value)
+                else:
+                    stats[name] += value
+        for values in [stats] + list(files.values()):
+            accesses = values['hits'] + values['misses']
+            values['hit_ratio'] = values['hits'] / accesses if accesses else 0.0
+        stats.update(gauges)
+        stats['files'] = files
+        stats['partitions'] = dict(partitions)
+        return stats
+
+    def _count_flush(self, file_id, blocks, seconds):
+        # a write of blocks back to the file took seconds
+        kind = self._file_kinds[file_id]
+        with self._stats_lock:
+            stats = self._flush_stats
+            stats[kind, 'flushed_blocks'] += blocks
+            stats[kind, 'flush_writes'] += 1
+            stats[kind, 'flush_seconds'] += seconds
+            if seconds > stats[kind, 'flush_max_seconds']:
+                stats[kind, 'flush_max_seconds'] = seconds
+
+    def set_replacement_policy(self, policy):
+        """switch to another replacement policy; the cached blocks are kept"""
+        for shard in self._shards:
+            with shard.latch:
+                replacer = create_replacer(policy, shard.capacity)
+                for key in shard.blocks:
+                    replacer.admit(key)
+                shard.replacer = replacer
+        self.replacement_policy = policy
+
+    def attach_log(self, log):
+        """log every change of the blocks loaded from now on to the write-ahead log"""
+        self._log = log
+
+    def file_id(self, file_path):
+        """return the interned id of a file"""
+        file_id = self._file_ids.get(file_path)
+        if file_id is None:
+            abs_path = os.path.abspath(file_path)
+            with self._catalog_lock:
+                file_id = self._file_ids.get(abs_path)
+                if file_id is None:
+                    file_id = len(self._file_paths)
+                    self._file_paths.append(abs_path)
+                    kind = os.path.splitext(abs_path)[1][1:]
+                    kind = kind if kind in ('table', 'index') else 'other'
+                    self._file_kinds.append(kind)
+                    self._file_partitions.append(self._partition_of(abs_path, kind))
+                    self._file_ids[abs_path] = file_id
+                self._file_ids[file_path] = file_id
+        return file_id
+
+    def _partition_of(self, abs_path, kind):
+        for partition in (os.path.basename(abs_path), kind):
+            if partition in self.quotas or partition in self.reserved:
+                return partition
+        return None
+
+    def set_partitions(self, quotas=None, reserved=None):
+        """replace the quotas and the reserved shares of the partitions; the cached blocks are kept,
+        a partition over its new quota shrinks as its blocks are swapped out"""
+        with ExitStack() as latches:
+            for shard in self._shards:
+                latches.enter_context(shard.latch)
+            with self._catalog_lock:
+                self.quotas = dict(quotas or {})
+                self.reserved = dict(reserved or {})
+                self._file_partitions[:] = [self._partition_of(abs_path, kind)
+                                            for abs_path, kind in zip(self._file_paths, self._file_kinds)]
+            for shard in self._shards:
+                shard.partition_blocks = Counter()
+                for file_id, offsets in shard.file_blocks.items():
+                    partition = self._file_partitions[file_id]
+                    if partition is not None:
+                        shard.partition_blocks[partition] += len(offsets)
+
+    def resize(self, total_blocks):
+        """grow or shrink the buffer to total_blocks blocks while it is in use
+        growing adds the frames from a new arena; shrinking swaps out the coldest blocks of every shard,
+        writing the dirty ones back, and gives up the frames freed, the frames of pinned blocks once
+        they are swapped out; the memory of an arena is freed once all of its frames are given up
+        the number of shards is fixed when the buffer is created, so total_blocks must be at least that"""
+        shard_count = len(self._shards)
+        if total_blocks < shard_count:
+            raise ValueError('the buffer needs {} blocks at least, one per shard'.format(shard_count))
+        capacities = [total_blocks * (i + 1) // shard_count - total_blocks * i // shard_count
+                      for i in range(shard_count)]
+        with self._resize_lock:
+            grown = sum(max(0, capacity - shard.frame_count) for shard, capacity in zip(self._shards, capacities))
+            frames = self._new_frames(grown) if grown else []
+            for shard, capacity in zip(self._shards, capacities):
+                with shard.latch:
+                    if capacity > shard.frame_count:
+                        grown = capacity - shard.frame_count
+                        shard.free_frames.extend(frames[:grown])
+                        del frames[:grown]
+                        shard.frame_count = capacity
+                    shard.capacity = capacity
+                    shard.replacer.resize(capacity)
+                    while len(shard.blocks) > capacity:
+                        try:
+                            self._evict(shard)
+                        except RuntimeError:  # the rest is pinned; the next misses swap it out
+                            break
+                    # the frames of the newest arenas are given up first, so that their memory is freed
+                    shard.free_frames.sort()
+                    excess = min(shard.frame_count - capacity, len(shard.free_frames))
+                    if excess > 0:
+                        for frame in shard.free_frames[-excess:]:
+                            self._drop_frame(frame)
+                        del shard.free_frames[-excess:]
+                        shard.frame_count -= excess
+                    shard.free_frames.reverse()
+            self.total_blocks = total_blocks
+
+    def _new_frames(self, count):
+        # carve count frames out of a new arena and return their numbers
+        arena = bytearray(self.block_size * count)
+        view = memoryview(arena)
+        first = len(self._frames)
+        with self._arena_lock:
+            self._arenas.append([arena, count])
+            self._frame_arenas.extend([len(self._arenas) - 1] * count)
+        self._frame_latches.extend(threading.RLock() for _ in range(count))
+        self._frames.extend(view[i * self.block_size:(i + 1) * self.block_size] for i in range(count))
+        return list(range(first, first + count))
+
+    def _drop_frame(self, frame):
+        # give up a frame for good; the arena is freed along with its last frame, once no view of it is left
+        with self._arena_lock:
+            self._frames[frame] = None
+            arena = self._arenas[self._frame_arenas[frame]]
+            arena[1] -= 1
+            if arena[1] == 0:
+                arena[0] = None
+
+    def _shard(self, file_id, block_offset):
+        return self._shards[(file_id * 40503 + (block_offset >> _extent_shift)) % len(self._shards)]
 
     def get_file_block(self, file_path, block_offset):
-        abs_path = os.path.abspath(file_path)
-        if (abs_path, block_offset) in self._blocks:
-            # found a cached block
-            return self._blocks[(abs_path, block_offset)]
-        elif len(self._blocks) < self.total_blocks:
-            # has free space
-            block = Block(self.block_size, abs_path, block_offset)
-            self._blocks[(abs_path, block_offset)] = block
+        """return the block, loading it if needed
+        another thread may swap the block out as soon as it is returned, unless it is pinned;
+        use pinned() to get a block that is used while other threads run"""
+        return self._get_block(file_path, block_offset, False)
+
+    @contextmanager
+    def pinned(self, file_path, block_offset):
+        """a context manager that gets the block already pinned, so that no other thread can swap it out
+        between the lookup and the pin, and unpins it at the end"""
+        block = self._get_block(file_path, block_offset, True)
+        try:
+            yield block
+        finally:
+            block.unpin()
+
+    def _get_block(self, file_path, block_offset, pin_block):
+        file_id = self.file_id(file_path)
+        key = (file_id, block_offset)
+        shard = self._shard(file_id, block_offset)
+        with shard.latch:
+            while True:
+                block = shard.blocks.get(key)
+                if block is not None:
+                    # found a cached block
+                    block.prefetched = False
+                    if block.read_ahead:
+                        # the first use of a block read ahead admits it, as a miss served ahead of time;
+                        # counted as an access, a scan would make every block it reads look hot to 2q
+                        block.read_ahead = False
+                        shard.stats[self._file_kinds[file_id], 'misses'] += 1
+                    else:
+                        shard.replacer.access(key)
+                        shard.stats[self._file_kinds[file_id], 'hits'] += 1
+                    break
+                partition = self._file_partitions[file_id]
+                if self._full(shard, partition):
+                    self._evict(shard, partition)
+                    continue  # the latch may have been released while waiting for a victim, look the block up again
+                shard.stats[self._file_kinds[file_id], 'misses'] += 1
+                if self._next_miss.get(file_id) == block_offset and self.read_ahead_blocks > 1 \
+                        and self.storage != 'mmap':  # the kernel reads ahead mapped files by itself
+                    block = self._read_ahead(shard, file_id, block_offset, partition)
+                else:
+                    self._next_miss[file_id] = block_offset + 1
+                    block = self._load_block(shard, file_id, block_offset)
+                    shard.add(key, block)
+                break
+            if pin_block:
+                block.pin()
             return block
-        else:
-            # buffer is full; try to swap out the lru block
-            lru_key = None
-            lru_block = None
-            for key, block in self._blocks.items():
-                if block.pin_count == 0:
-                    if lru_block is None or block.last_accessed_time < lru_block.last_accessed_time:
-                        lru_key = key
-                        lru_block = block
-            if lru_block is None:
+
+    @property
+    def shard_capacity(self):
+        """the number of frames of the smallest shard, which bounds the blocks a span or the pinned blocks take"""
+        return min(shard.capacity for shard in self._shards)
+
+    def get_file_span(self, file_path, block_offset, count):
+        """return count consecutive blocks from block_offset on as a BlockSpan, loading the missing ones together
+        the span must lie within an extent of 64 blocks, so that its blocks belong to a single shard,
+        and take no more blocks than the frames of the shard
+        as with get_file_block(), the blocks may be swapped out as soon as the span is returned, unless it is pinned"""
+        span = BlockSpan(self._get_span(file_path, block_offset, count))
+        span.unpin()
+        return span
+
+    @contextmanager
+    def pinned_span(self, file_path, block_offset, count):
+        """a context manager that gets a BlockSpan already pinned, and unpins it at the end"""
+        span = BlockSpan(self._get_span(file_path, block_offset, count))
+        try:
+            yield span
+        finally:
+            span.unpin()
+
+    def _get_span(self, file_path, block_offset, count):
+        if block_offset >> _extent_shift != (block_offset + count - 1) >> _extent_shift:
+            raise ValueError('blocks {} to {} cross an extent'.format(block_offset, block_offset + count - 1))
+        file_id = self.file_id(file_path)
+        kind = self._file_kinds[file_id]
+        partition = self._file_partitions[file_id]
+        shard = self._shard(file_id, block_offset)
+        if count > shard.capacity:
+            raise ValueError('a span of {} blocks does not fit in a shard of {} frames'.format(count, shard.capacity))
+        blocks = []  # pinned as soon as they are found, so that the rest of the span can't swap them out
+        try:
+            with shard.latch:
+                while len(blocks) < count:
+                    offset = block_offset + len(blocks)
+                    block = shard.blocks.get((file_id, offset))
+                    if block is not None:
+                        block.prefetched = False
+                        if block.read_ahead:  # its first use, see _get_block
+                            block.read_ahead = False
+                            shard.stats[kind, 'misses'] += 1
+                        else:
+                            shard.replacer.access((file_id, offset))
+                            shard.stats[kind, 'hits'] += 1
+                        block.pin()
+                        blocks.append(block)
+                        continue
+                    run = 1
+                    while run < count - len(blocks) and (file_id, offset + run) not in shard.blocks:
+                        run += 1
+                    loaded = self._load_span_run(shard, file_id, offset, run, partition)
+                    shard.stats[kind, 'misses'] += len(loaded)
+                    for block in loaded:
+                        block.pin()
+                    blocks.extend(loaded)
+        except BaseException:
+            for block in blocks:
+                block.unpin()
+            raise
+        return blocks
+
+    def _load_span_run(self, shard, file_id, block_offset, count, partition):
+        """load count missing blocks of a span and return them, or as many of them as possible,
+        or no block at all if the latch was released while waiting for a victim"""
+        if self.storage == 'mmap':
+            count = 1  # a mapped block is loaded as a window into the file, not read
+        frames = []
+        try:
+            while len(frames) < count:
+                if self._full(shard, partition, len(frames)):
+                    try:
+                        self._evict(shard, partition, wait=False, pending=len(frames))
+                    except RuntimeError:
+                        if not shard.flushing:
+                            raise
+                        shard.free_frames.extend(frames)  # nobody must miss them while the latch is released
+                        frames = []
+                        shard.flushed.wait()
+                        return []
+                    continue
+                if self.storage == 'mmap':
+                    block = self._load_block(shard, file_id, block_offset)
+                    shard.add((file_id, block_offset), block)
+                    return [block]
+                frames.append(shard.free_frames.pop())
+        except BaseException:
+            shard.free_frames.extend(frames)
+            raise
+        # a new node lies beyond the end of the file, as a whole
+        return self._load_run(shard, file_id, block_offset, frames, past_end=True)
+
+    def _read_ahead(self, shard, file_id, block_offset, partition):
+        """load the missing block together with the blocks following it, up to the next cached one,
+        into as many frames with a single vectored read, and return the missing block
+        the shard has room for the missing block at least"""
+        extent_end = (block_offset >> _extent_shift) + 1 << _extent_shift
+        window = min(self.read_ahead_blocks, max(1, shard.capacity // 4), extent_end - block_offset)
+        frames = []
+        try:
+            while len(frames) < window and (file_id, block_offset + len(frames)) not in shard.blocks:
+                if frames and self._over_quota(shard, partition, len(frames)) \
+                        and not self._has_evictable(shard, partition):
+                    break  # reading ahead takes no room from the other partitions beyond the quota
+                if self._full(shard, partition, len(frames)):
+                    try:
+                        self._evict(shard, partition, wait=False, pending=len(frames))
+                    except RuntimeError:  # everything else is pinned or being written back; read ahead less
+                        break
+                    continue
+                frames.append(shard.free_frames.pop())
+        except BaseException:
+            shard.free_frames.extend(frames)
+            raise
+        blocks = self._load_run(shard, file_id, block_offset, frames)
+        for block in blocks[1:]:
+            block.prefetched = True
+            block.read_ahead = True
+        shard.stats[self._file_kinds[file_id], 'prefetched'] += len(blocks) - 1
+        self._next_miss[file_id] = block_offset + len(blocks)
+        return blocks[0]
+
+    def _load_run(self, shard, file_id, block_offset, frames, past_end=False):
+        """load the blocks from block_offset on into frames taken from the shard, with a single vectored read,
+        add them to the shard and return them; the frames beyond the end of the file, but the first, are given back,
+        unless past_end is asserted"""
+        abs_path = self._file_paths[file_id]
+        try:
+            loaded = self._files.read_vectored(abs_path, block_offset * self.block_size,
+                                               [self._frames[frame] for frame in frames])
+        except BaseException:
+            shard.free_frames.extend(frames)
+            raise
+        blocks = []
+        for i, frame in enumerate(frames):
+            effective_bytes = min(max(loaded - i * self.block_size, 0), self.block_size)
+            if i > 0 and effective_bytes == 0 and not past_end:  # beyond the end of the file
+                shard.free_frames.extend(frames[i:])
+                break
+            blocks.append(Block(self._frames[frame], frame, file_id, abs_path, block_offset + i, self._files,
+                                shard, self._log, effective_bytes, self._frame_latches[frame]))
+        for block in blocks:
+            shard.add((file_id, block.block_offset), block)
+        return blocks
+
+    def save_manifest(self):
+        """list the blocks cached, hottest first, in the manifest, which warm_up() reloads after a restart
+        blocks read ahead but never used are left out"""
+        if not self.manifest_path:
+            return
+        entries = []
+        for shard in self._shards:
+            with shard.latch:
+                entries.extend((block.last_accessed, key) for key, block in shard.blocks.items() if not block.prefetched)
+        entries.sort(reverse=True)
+        file_ids = sorted({key[0] for _, key in entries})
+        file_indexes = {file_id: i for i, file_id in enumerate(file_ids)}
+        manifest = bytearray(self.manifest_header.pack(len(file_ids), len(entries)))
+        for file_id in file_ids:
+            path = self._file_paths[file_id].encode('utf-8')
+            manifest += self.manifest_path_struct.pack(len(path))
+            manifest += path
+        for _, (file_id, block_offset) in entries:
+            manifest += self.manifest_entry.pack(file_indexes[file_id], block_offset)
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(manifest)
+        os.replace(temp_path, self.manifest_path)  # a crash leaves either manifest behind, never half of one
+
+    def _read_manifest(self):
+        """return the (absolute path, block offset) of the blocks in the manifest, hottest first
+        a missing or damaged manifest only costs the warmth, so it is taken as an empty one"""
+        try:
+            with open(self.manifest_path, 'rb') as file:
+                manifest = file.read()
+            file_count, block_count = self.manifest_header.unpack_from(manifest, 0)
+            position = self.manifest_header.size
+            paths = []
+            for _ in range(file_count):
+                size, = self.manifest_path_struct.unpack_from(manifest, position)
+                position += self.manifest_path_struct.size
+                paths.append(manifest[position:position + size].decode('utf-8'))
+                position += size
+            if len(manifest) - position != block_count * self.manifest_entry.size:
+                return []
+            return [(paths[i], block_offset) for i, block_offset in self.manifest_entry.iter_unpack(manifest[position:])]
+        except (OSError, StructError, UnicodeDecodeError, IndexError):
+            return []
+
+    def warm_up(self, background=True):
+        """reload the blocks listed in the manifest, in runs of adjacent blocks read with single vectored reads,
+        by a background thread which is returned, unless background is False
+        only free frames are filled, so no block is swapped out; if the buffer is smaller than before the restart,
+        the hottest blocks are reloaded; mapped files are left to the page cache, which survives a restart"""
+        if not self.manifest_path or self.storage == 'mmap':
+            return None
+        entries = self._read_manifest()[:self.total_blocks]
+        if not background:
+            self._warm_up(entries)
+            return None
+        thread = threading.Thread(target=self._warm_up, args=(entries,), name='buffer-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self, entries):
+        files = {}
+        for abs_path, block_offset in entries:
+            files.setdefault(abs_path, []).append(block_offset)
+        for abs_path, block_offsets in files.items():
+            file_id = self.file_id(abs_path)
+            block_offsets.sort()
+            begin = 0
+            try:
+                for end in range(1, len(block_offsets) + 1):
+                    # a run ends at a gap, or at the end of an extent, so that it belongs to a single shard
+                    if (end == len(block_offsets) or block_offsets[end] != block_offsets[end - 1] + 1
+                            or block_offsets[end] >> _extent_shift != block_offsets[begin] >> _extent_shift):
+                        self._warm_up_run(file_id, block_offsets[begin], end - begin)
+                        begin = end
+            except FileNotFoundError:  # the table or index is dropped meanwhile
+                continue
+            except OSError as error:
+                print('buffer warm-up: {}'.format(error))
+
+    def _warm_up_run(self, file_id, block_offset, count):
+        shard = self._shard(file_id, block_offset)
+        partition = self._file_partitions[file_id]
+        end = block_offset + count
+        with shard.latch:
+            while block_offset < end:
+                frames = []
+                while (block_offset + len(frames) < end and (file_id, block_offset + len(frames)) not in shard.blocks
+                       and not self._full(shard, partition, len(frames))):
+                    frames.append(shard.free_frames.pop())
+                if frames:
+                    blocks = self._load_run(shard, file_id, block_offset, frames)
+                    for block in blocks:
+                        block.prefetched = True
+                    shard.stats[self._file_kinds[file_id], 'prefetched'] += len(blocks)
+                elif (file_id, block_offset) not in shard.blocks:
+                    return  # no room left in the shard
+                block_offset += max(1, len(frames))
+
+    def _load_block(self, shard, file_id, block_offset):
+        abs_path = self._file_paths[file_id]
+        if self.storage == 'mmap':
+            with self._catalog_lock:
+                mapped_file = self._mapped_files.get(file_id)
+                if mapped_file is None:
+                    mapped_file = MappedFile(abs_path, self.block_size, self._files)
+                    self._mapped_files[file_id] = mapped_file
+            window = mapped_file.window(block_offset)
+            if window is not None:
+                return MappedBlock(window, file_id, abs_path, block_offset, shard, self._log)
+            # the tail of the file, or beyond it; such a block is loaded as usual and extends the file on flush
+        frame = shard.free_frames.pop()
+        try:
+            return Block(self._frames[frame], frame, file_id, abs_path, block_offset, self._files,
+                         shard, self._log, None, self._frame_latches[frame])
+        except BaseException:
+            shard.free_frames.append(frame)
+            raise
+
+    def _full(self, shard, partition, pending=0):
+        """whether a block of the partition must swap out another block before it is loaded into the shard,
+        where pending frames are already taken
+        a partition at its quota gives way only while one of its own blocks can be swapped out;
+        swapping out the blocks of the others wouldn't bring it below its quota"""
+        if len(shard.blocks) + pending >= shard.capacity:
+            return True
+        return self._over_quota(shard, partition, pending) and self._has_evictable(shard, partition)
+
+    def _over_quota(self, shard, partition, pending=0):
+        quota = self.quotas.get(partition)
+        return quota is not None and shard.partition_blocks[partition] + pending >= shard.limit(quota)
+
+    def _has_evictable(self, shard, partition):
+        partitions = self._file_partitions
+        return any(partitions[key[0]] == partition and block.pin_count == 0 and key not in shard.flushing
+                   for key, block in shard.blocks.items())
+
+    def _evict(self, shard, partition=None, wait=True, pending=0):
+        """swap out a block of the shard, chosen by the replacement policy, to make room for a block
+        of the partition and return True
+        if every block is pinned or being written back, wait for the write-back to finish, if asked to,
+        and return False, since the latch was released meanwhile"""
+        def evictable(k):
+            return shard.blocks[k].pin_count == 0 and k not in shard.flushing
+        key = None
+        if self.quotas or self.reserved:
+            key = shard.replacer.evict(self._partition_filter(shard, partition, evictable, pending))
+        if key is None:
+            key = shard.replacer.evict(evictable)
+        if key is None:
+            if not (wait and shard.flushing):
                 raise RuntimeError('All blocks are pinned, buffer ran out of blocks')
+            shard.flushed.wait()
+            return False
+        block = shard.blocks[key]
+        kind = self._file_kinds[block.file_id]
+        shard.stats[kind, 'evictions'] += 1
+        if block.dirty and block.frame is not None:
+            shard.stats[kind, 'dirty_evictions'] += 1
+            if self._flusher is not None:
+                # dirty blocks reach the end of the queue, the flusher should catch up
+                self._flusher_wakeup.set()
+            begin = time.perf_counter()
+            block.flush()
+            self._count_flush(block.file_id, 1, time.perf_counter() - begin)
+        else:
+            block.flush()
+        self._release(shard, shard.remove(key))
+        return True
+
+    def _partition_filter(self, shard, partition, evictable, pending=0):
+        # a partition at its quota swaps out one of its own blocks;
+        # any other partition swaps out any block but those of the partitions within their reserved share
+        partitions = self._file_partitions
+        if self._over_quota(shard, partition, pending):
+            return lambda k: partitions[k[0]] == partition and evictable(k)
+        protected = {name for name, share in self.reserved.items()
+                     if name != partition and shard.partition_blocks[name] <= shard.limit(share)}
+        if not protected:
+            return evictable
+        return lambda k: partitions[k[0]] not in protected and evictable(k)
+
+    def _release(self, shard, block):
+        """give the frame of a block back to the arena"""
+        if block.prefetched:
+            shard.stats[self._file_kinds[block.file_id], 'prefetched_unused'] += 1
+        if block.frame is not None:
+            if shard.frame_count > shard.capacity:  # the buffer was shrunk while the frame was in use
+                shard.frame_count -= 1
+                self._drop_frame(block.frame)
             else:
-                lru_block.flush()
-                del self._blocks[lru_key]
-                block = Block(self.block_size, abs_path, block_offset)
-                self._blocks[(abs_path, block_offset)] = block
-                return block
+                shard.free_frames.append(block.frame)
+            block._memory = None  # any further use of the stale block fails instead of corrupting the frame
 
     def detach_from_file(self, file_path):
-        """delete all cached blocks associated with the given file"""
+        """delete all cached blocks associated with the given file and close its descriptor"""
         abs_path = os.path.abspath(file_path)
-        for key in list(self._blocks):
-            if key[0] == abs_path:
-                del self._blocks[key]
+        file_id = self.file_id(abs_path)
+        self.invalidate(abs_path)
+        self._next_miss.pop(file_id, None)
+        self._files.close(abs_path)
+
+    def invalidate(self, file_path, begin=0, end=None):
+        """drop the cached blocks of a file from block offset begin up to end, or to the end of the file if None,
+        without writing them back, e.g. once the file is deleted, truncated or created anew
+        it takes time in proportion to the number of blocks of the file cached, not to the size of the buffer"""
+        file_id = self.file_id(file_path)
+        for shard in self._shards:
+            with shard.latch:
+                while True:
+                    keys = [(file_id, offset) for offset in shard.file_blocks.get(file_id, ())
+                            if offset >= begin and (end is None or offset < end)]
+                    if not any(key in shard.flushing for key in keys):
+                        break
+                    shard.flushed.wait()  # the latch is released meanwhile, so the blocks are looked up again
+                for key in keys:
+                    self._release(shard, shard.remove(key))
+                    shard.replacer.remove(key)
+        with self._catalog_lock:
+            # the file may have shrunk under its mappings, which are released once the last view of them is gone
+            self._mapped_files.pop(file_id, None)
 
     def flush_all(self):
-        for block in self._blocks.values():
-            block.flush()
+        """write every dirty block back, merging adjacent blocks into vectored writes"""
+        batch = []
+        for shard in self._shards:
+            with shard.latch:
+                while shard.flushing:
+                    shard.flushed.wait()
+                self._mark_for_write_back(shard, [block for block in shard.blocks.values() if block.dirty], batch)
+        try:
+            self._write_back(batch)
+        finally:
+            self._end_write_back(batch)
+        self._flush_mapped_files()
+
+    def sync(self):
+        """fsync every file written since the last sync"""
+        self._files.sync_all()
+
+    def _flush_mapped_files(self):
+        with self._catalog_lock:
+            mapped_files = list(self._mapped_files.values())
+        for mapped_file in mapped_files:
+            mapped_file.flush()
+
+    def _mark_for_write_back(self, shard, blocks, batch):
+        """clear the dirty flags of blocks of the shard, whose latch is held, and add them to batch,
+        marked as being written back, so that they are not swapped out or detached while the latch is
+        released for the I/O; a mapped block is only marked clean, msync writes it back"""
+        for block in blocks:
+            with block.latch:  # wait for a change in progress, which may not be logged yet
+                block.dirty = False
+            if block.frame is not None:
+                shard.flushing.add((block.file_id, block.block_offset))
+                batch.append(block)
+
+    def _end_write_back(self, batch):
+        shards = {}
+        for block in batch:
+            shards.setdefault(self._shard(block.file_id, block.block_offset), []).append(block)
+        for shard, blocks in shards.items():
+            with shard.latch:
+                for block in blocks:
+                    shard.flushing.discard((block.file_id, block.block_offset))
+                shard.flushed.notify_all()
+
+    def _write_back(self, blocks):
+        """write blocks, whose dirty flags are already cleared, back to their files
+        blocks adjacent in the same file are written with a single pwritev()"""
+        blocks = sorted(blocks, key=lambda b: (b.file_id, b.block_offset))
+        begin = 0
+        for end in range(1, len(blocks) + 1):
+            if (end == len(blocks)
+                    or blocks[end].file_id != blocks[end - 1].file_id
+                    or blocks[end].block_offset != blocks[end - 1].block_offset + 1):
+                self._write_run(blocks[begin:end])
+                begin = end
+
+    def _write_run(self, run):
+        # every block but the last is written as a whole frame, so that the next one lands at its own offset;
+        # the bytes beyond effective_bytes are either what the file already holds there or zeros of a hole
+        with ExitStack() as latches:
+            for block in run:  # latched in the order of the file, so two write-backs never deadlock
+                latches.enter_context(block.latch)
+            buffers = [block._memory for block in run[:-1]]
+            buffers.append(run[-1]._memory[:run[-1].effective_bytes])
+            begin = time.perf_counter()
+            try:
+                if self._log is not None:
+                    self._log.flush_to(max(block.page_lsn for block in run))
+                self._files.write_vectored(run[0].file_path, run[0].block_offset * self.block_size, buffers)
+            except FileNotFoundError:
+                pass  # the file is deleted, see Block.flush()
+            except BaseException:
+                for block in run:
+                    block.dirty = True
+                raise
+        self._count_flush(run[0].file_id, len(run), time.perf_counter() - begin)
+
+    def start_flusher(self):
+        """start the background flusher thread, if it is not running yet"""
+        with self._catalog_lock:
+            if self._flusher is None:
+                stop = threading.Event()
+                thread = threading.Thread(target=self._flusher_loop, args=(stop,), name='buffer-flusher', daemon=True)
+                self._flusher = (thread, stop)
+                thread.start()
+
+    def stop_flusher(self):
+        """stop the background flusher thread and wait for it to finish the current batch"""
+        with self._catalog_lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            thread, stop = flusher
+            stop.set()
+            self._flusher_wakeup.set()
+            thread.join()
+
+    def _flusher_loop(self, stop):
+        while not stop.is_set():
+            urgent = self._flusher_wakeup.wait(self.flush_interval)
+            self._flusher_wakeup.clear()
+            if not stop.is_set():
+                try:
+                    self._flush_cold_blocks(urgent)
+                    self._checkpoint_if_due()
+                except OSError as error:  # the blocks stay dirty and are retried next time
+                    print('buffer flusher: {}'.format(error))
+
+    def _checkpoint_if_due(self):
+        if self._log is not None and (self._log.size >= self.checkpoint_log_size
+                                      or time.monotonic() - self._checkpoint_time >= self.checkpoint_interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """take a fuzzy checkpoint and discard the log before its redo point
+        queries go on meanwhile; only the blocks dirty since before the previous checkpoint are written back,
+        so a hot block is written at most once per checkpoint, and every change reaches its file
+        within two checkpoints, which bounds the log replayed by a recovery
+        the redo point is the oldest change still only in memory, i.e. the least rec_lsn of the dirty blocks
+        left, or the end of the log if there is none"""
+        if self._log is None:
+            return
+        begin_lsn = redo_lsn = self._log.lsn
+        batch = []
+        for shard in self._shards:
+            with shard.latch:
+                while shard.flushing:
+                    shard.flushed.wait()
+                old_blocks = []
+                for block in shard.blocks.values():
+                    with block.latch:  # a change in progress may have set rec_lsn, but not dirty yet
+                        if not block.dirty:
+                            continue
+                        if block.frame is None or block.rec_lsn < self._checkpoint_lsn:
+                            old_blocks.append(block)
+                        else:
+                            redo_lsn = min(redo_lsn, block.rec_lsn)
+                self._mark_for_write_back(shard, old_blocks, batch)
+        try:
+            self._write_back(batch)
+        finally:
+            self._end_write_back(batch)
+        # the changes before the redo point are in the files, or in the page cache for the mapped ones
+        self._flush_mapped_files()
+        self._files.sync_all()
+        self._log.truncate(redo_lsn)
+        self._checkpoint_lsn = begin_lsn
+        self._checkpoint_time = time.monotonic()
+        self.save_manifest()
+
+    def _flush_cold_blocks(self, urgent=False):
+        """write back the coldest dirty blocks of every shard until its low watermark is reached,
+        provided its high watermark is exceeded, or urgent is asserted"""
+        batch = []
+        for shard in self._shards:
+            with shard.latch:
+                dirty_blocks = [block for key, block in shard.blocks.items()
+                                if block.dirty and block.frame is not None and key not in shard.flushing]
+                if not urgent and len(dirty_blocks) <= shard.capacity * self.dirty_high_watermark:
+                    continue
+                dirty_blocks.sort(key=lambda b: b.last_accessed)
+                keep = int(shard.capacity * self.dirty_low_watermark)
+                self._mark_for_write_back(shard, dirty_blocks[:max(0, len(dirty_blocks) - keep)], batch)
+        try:
+            # the latches are released during the I/O; the blocks can't be swapped out or detached meanwhile
+            self._write_back(batch)
+        finally:
+            self._end_write_back(batch)
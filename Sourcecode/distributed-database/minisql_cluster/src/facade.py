@@ -1,8 +1,10 @@
 from minisql_cluster.src.index_manager import IndexManager
 from minisql_cluster.src.record_manager import RecordManager
 from minisql_cluster.src.catalog_manager import load_metadata, Column
-from minisql_cluster.src.buffer_manager import BufferManager
+from minisql_cluster.src.buffer_manager import BufferManager, parse_size
+from minisql_cluster.src.log_manager import LogManager
 
+import itertools
 import os
 import shutil
 
@@ -11,6 +13,7 @@ import shutil
 
 # v2.2 use the index
 # only support operators in '>, =, <'
+# v2.3 the scans support all of '=, !=, >, <, >=, <=', the index is used for '>=, <=' in selects too
 # BUGs
 # 1. after drop or delete_all operation, the buffer cannot be flushed,
 # hence, it's impossible to insert the same record when the old one
@@ -22,6 +25,10 @@ import shutil
 # or 'where age > 12 and age < 50', but 'where age > 10 and age < 30' is not allowed
 #
 
+# the most records read at once in a select through an index
+_index_batch_records = 8192
+
+
 class MinisqlFacade:
     @staticmethod
     def get_columns_name(table_name):
@@ -29,10 +36,46 @@ class MinisqlFacade:
         columns = list(metadata.tables[table_name].columns.keys())
         return columns
 
+    @staticmethod
+    def start():
+        BufferManager.configure()  # the size of the buffer and the like, from the environment
+        LogManager.configure()  # the group commit, from the environment
+        log_manager = LogManager()
+        log_manager.recover()  # redo the changes that hadn't reached the files when the server stopped
+        buffer_manager = BufferManager()
+        buffer_manager.attach_log(log_manager)
+        log_manager.start()
+        buffer_manager.start_flusher()
+        buffer_manager.warm_up()  # reload the blocks cached before the restart, in the background
+
+    @staticmethod
+    def commit(callback=None):
+        # callback is called once the changes made by the statement are durable
+        RecordManager.flush_headers()  # the headers of the tables changed by the statement go along with it
+        LogManager().commit(callback)
+
     @staticmethod
     def quit():
         buffer_manager = BufferManager()
+        log_manager = LogManager()
+        RecordManager.flush_headers()
+        buffer_manager.stop_flusher()
+        log_manager.stop()
         buffer_manager.flush_all()
+        buffer_manager.sync()
+        log_manager.reset()  # every change is in the files now
+        buffer_manager.save_manifest()
+
+    @staticmethod
+    def buffer_stats():
+        # counters of the buffer manager, to size the buffer from data
+        return BufferManager().stats
+
+    @staticmethod
+    def resize_buffer(size):
+        # size in bytes, or with a suffix K, M or G, e.g. '256M'
+        buffer_manager = BufferManager()
+        buffer_manager.resize(max(1, parse_size(size) // buffer_manager.block_size))
 
     @staticmethod
     def create_table(table_name, primary_key, columns):
@@ -74,7 +117,39 @@ class MinisqlFacade:
                 raise
 
     @staticmethod
-    def create_index(table_name, index_name, column_name):
+    def insert_records(table_name, rows):
+        # insert many records at once, the keys of every index inserted as a sorted batch
+        # all or nothing: a record that cannot be packed is refused before any is written,
+        # and if a key is duplicated, the records written are deleted again
+        RecordManager.set_file_dir('schema/tables/' + table_name + '/')
+        metadata = load_metadata()
+        table = metadata.tables[table_name]
+        rows = [tuple(row) for row in rows]
+        positions = RecordManager.insert_many(table_name, table.fmt, rows)
+        done = []
+        try:
+            for index_name, index in table.indexes.items():
+                file_path = RecordManager.file_dir + index_name + '.index'
+                fmt = ''.join(table.columns[column].fmt for column in index.columns)
+                manager = IndexManager(file_path, fmt)
+                key_pos = list(table.columns.keys()).index(index.columns[0])
+                manager.insert_many(([row[key_pos]], position) for row, position in zip(rows, positions))
+                manager.dump_header()
+                done.append((manager, key_pos))
+        except Exception:  # e.g. a duplicated key, the inserted records should be deleted
+            for manager, key_pos in done:
+                for row in rows:
+                    manager.delete([row[key_pos]])
+                manager.dump_header()
+            for position in positions:
+                RecordManager.delete(table_name, table.fmt, with_index=True, record_offset=position)
+            raise
+        return len(positions)
+
+    @staticmethod
+    def create_index(table_name, index_name, column_name, node_size=None):
+        # node_size in bytes, e.g. 16384 or 65536, a block by default, see IndexManager.node_blocks_of
+        IndexManager.node_blocks_of(node_size)  # a bad size is refused before the index is recorded
         RecordManager.set_file_dir('schema/tables/' + table_name + '/')
         offset = -1
         metadata = load_metadata()
@@ -83,7 +158,7 @@ class MinisqlFacade:
         file_path = RecordManager.file_dir + index_name + '.index'
         table_target = metadata.tables[table_name]
         fmt = ''.join(table_target.columns[column].fmt for column in table_target.indexes[index_name].columns)
-        manager = IndexManager(file_path, fmt)
+        manager = IndexManager(file_path, fmt, node_size)
         key_pos = list(metadata.tables[table_name].columns.keys()).index(column_name)
         for record in records:
             key_list = list()
@@ -94,12 +169,25 @@ class MinisqlFacade:
         manager.dump_header()
 
     @staticmethod
-    def select_record_all(table_name):
+    def select_record_all(table_name, columns=None):
+        # columns, the names of the attributes to return, all of them if None
         metadata = load_metadata()
         RecordManager.set_file_dir('schema/tables/' + table_name + '/')
-        records = RecordManager.select(table_name, metadata.tables[table_name].fmt, with_index=False, conditions={})
+        records = RecordManager.select(table_name, metadata.tables[table_name].fmt, with_index=False, conditions={},
+                                       columns=MinisqlFacade._column_positions(table_name, columns))
         return records
 
+    @staticmethod
+    def _column_positions(table_name, columns):
+        # the positions of the attributes in the records of the table, None for all of them
+        if columns is None:
+            return None
+        names = MinisqlFacade.get_columns_name(table_name)
+        for column in columns:
+            if column not in names:
+                raise ValueError('There is no column {} in table {}'.format(column, table_name))
+        return [names.index(column) for column in columns]
+
     @staticmethod
     def _delete_stupid_index(record, table_name):
         metadata = load_metadata()
@@ -161,11 +249,11 @@ class MinisqlFacade:
             return condition_convert
 
     @staticmethod
-    def select_record_conditionally_without_index(table_name, condition):  # support only equivalent search
+    def select_record_conditionally_without_index(table_name, condition, columns=None):
         metadata = load_metadata()
         condition_convert = MinisqlFacade._convert_conditions(table_name, condition)
         records = RecordManager.select(table_name, metadata.tables[table_name].fmt, with_index=False,
-                                       conditions=condition_convert)
+                                       conditions=condition_convert, columns=columns)
         return records
 
     @staticmethod
@@ -197,10 +285,11 @@ class MinisqlFacade:
         return None
 
     @staticmethod
-    def _select_single_condition(table_name, condition):
+    def _select_single_condition(table_name, condition, columns=None):
+        # columns, the positions of the attributes to return, all of them if None
         metadata = load_metadata()
         index_name = MinisqlFacade._has_index(condition[0], table_name)
-        if index_name:
+        if index_name and condition[1] != '!=':  # the index can't help to find the records different from a key
             print('select with index on ', condition[0])
             attribute_name = condition[0]
             operator = condition[1]
@@ -209,69 +298,101 @@ class MinisqlFacade:
             file_path = RecordManager.file_dir + index_name + '.index'  #
             fmt = metadata.tables[table_name].columns[attribute_name].fmt
             manager = IndexManager(file_path, fmt)
-            records = list()
-            if operator == '=':
-                try:
-                    itr = manager.find(key_list)
-                    it_key, value = next(itr)
-                    if it_key[0] == key_list[0]:
-                        records.append(RecordManager.select(table_name,
-                                                            metadata.tables[table_name].fmt,
-                                                            with_index=True,
-                                                            record_offset=value))
-                except StopIteration:
-                    pass
-            elif operator == '>':
-                for i in manager.find(key_list):
-                    if i[0][0] > key_list[0]:
-                        value = i[1]
-                        records.append(RecordManager.select(table_name,
-                                                            metadata.tables[table_name].fmt,
-                                                            with_index=True,
-                                                            record_offset=value))
-            elif operator == '<':
-                for i in manager.iter_leaves():
-                    if i[0][0] < key_list[0]:
-                        value = i[1]
-                        records.append(RecordManager.select(table_name,
-                                                            metadata.tables[table_name].fmt,
-                                                            with_index=True,
-                                                            record_offset=value))
-                    else:
-                        break
-            else:
-                pass
+            records = MinisqlFacade._select_with_index(manager, table_name, metadata.tables[table_name].fmt,
+                                                       operator, key_list, columns)
         else:
-            records = MinisqlFacade.select_record_conditionally_without_index(table_name, condition)
+            records = MinisqlFacade.select_record_conditionally_without_index(table_name, condition, columns)
 
         return records
 
     @staticmethod
-    def select_record_conditionally(table_name, conditions):
+    def _select_with_index(manager, table_name, fmt, operator, key_list, columns=None):
+        # a generator, the records are read as the leaves of the index are walked,
+        # the offsets found are read in batches, each block once per batch,
+        # growing from a single record so that a LIMIT reads no more than needed
+        offsets = MinisqlFacade._offsets_with_index(manager, operator, key_list)
+        batch = 1
+        while True:
+            record_offsets = list(itertools.islice(offsets, batch))
+            if not record_offsets:
+                break
+            yield from RecordManager.select_many(table_name, fmt, record_offsets, columns)
+            batch = min(batch * 2, _index_batch_records)
+
+    @staticmethod
+    def _offsets_with_index(manager, operator, key_list):
+        # a generator of the offsets of the records meeting the condition, in the order of the keys
+        if operator == '=':
+            try:
+                itr = manager.find(key_list)
+                it_key, value = next(itr)
+                if it_key[0] == key_list[0]:
+                    yield value
+            except StopIteration:
+                pass
+        elif operator == '>' or operator == '>=':
+            for i in manager.find(key_list):
+                if i[0][0] > key_list[0] or operator == '>=' and i[0][0] == key_list[0]:
+                    yield i[1]
+        elif operator == '<' or operator == '<=':
+            for i in manager.iter_leaves():
+                if i[0][0] < key_list[0] or operator == '<=' and i[0][0] == key_list[0]:
+                    yield i[1]
+                else:
+                    break
+        else:
+            pass
+
+    @staticmethod
+    def select_record_conditionally(table_name, conditions, columns=None):
+        # return an iterable of the records, read lazily where possible
+        # columns, the names of the attributes to return, all of them if None
         RecordManager.set_file_dir('schema/tables/' + table_name + '/')
+        positions = MinisqlFacade._column_positions(table_name, columns)
         records = list()
         if len(conditions) == 1:
-            records += (MinisqlFacade._select_single_condition(table_name, conditions[0]))
+            records = MinisqlFacade._select_single_condition(table_name, conditions[0], positions)
         elif len(conditions) == 3:
+            # the whole records are compared, two records may be the same on the columns only
             record_1 = MinisqlFacade._select_single_condition(table_name, conditions[0])
             record_2 = MinisqlFacade._select_single_condition(table_name, conditions[2])
             if conditions[1] == 'and':
-                records = list(set(record_1).intersection(set(record_2)))
+                records = MinisqlFacade._intersection(record_1, record_2)
             elif conditions[1] == 'or':
-                records = list(set(record_1).union(set(record_2)))
+                records = MinisqlFacade._union(record_1, record_2)
             else:
                 pass
                 # link the records outside
+            if positions is not None:
+                records = (tuple(record[i] for i in positions) for record in records)
         else:
             pass
 
         return records
 
+    @staticmethod
+    def _intersection(records_1, records_2):
+        # only the records of the second condition are kept in memory, those of the first are streamed
+        records_2 = set(records_2)
+        seen = set()
+        for record in records_1:
+            if record in records_2 and record not in seen:
+                seen.add(record)
+                yield record
+
+    @staticmethod
+    def _union(records_1, records_2):
+        seen = set()
+        for record in itertools.chain(records_1, records_2):
+            if record not in seen:
+                seen.add(record)
+                yield record
+
     @staticmethod
     def _delete_single_condition(table_name, condition):
         metadata = load_metadata()
         index_name = MinisqlFacade._has_index(condition[0], table_name)
-        if index_name:
+        if index_name and condition[1] in ('=', '>', '<'):  # the other operators are left to the scan
             print('delete with index on ', condition[0])
             attribute_name = condition[0]
             operator = condition[1]
@@ -330,7 +451,8 @@ class MinisqlFacade:
             MinisqlFacade._delete_single_condition(table_name, conditions[0])
         elif len(conditions) == 3:
             if conditions[1] == 'and':
-                records = MinisqlFacade.select_record_conditionally(table_name, conditions)
+                # read all the records before deleting any, the scan mustn't run into the deleted ones
+                records = list(MinisqlFacade.select_record_conditionally(table_name, conditions))
                 for record in records:
                     for index_name, index in metadata.tables[table_name].indexes.items():
                         file_path = RecordManager.file_dir + index_name + '.index'
@@ -364,7 +486,13 @@ class MinisqlFacade:
         metadata = load_metadata()
         buffer_manager = BufferManager()
         MinisqlFacade.delete_record_all(table_name)
+        log_manager = LogManager()
+        lsn = log_manager.log_drop('schema/tables/' + table_name + '/' + table_name + '.table')
+        for index_name in metadata.tables[table_name].indexes:
+            lsn = log_manager.log_drop('schema/tables/' + table_name + '/' + index_name + '.index')
+        log_manager.flush_to(lsn)  # the drops are durable before the files go, or recovery would replay the old writes
         shutil.rmtree('schema/tables/' + table_name + '/', True)
+        RecordManager.close_table(table_name)
         buffer_manager.detach_from_file('schema/tables/' + table_name + '/' + table_name + '.table')
         for index_name in metadata.tables[table_name].indexes:
             buffer_manager.detach_from_file('schema/tables/' + table_name + '/' + index_name + '.index')
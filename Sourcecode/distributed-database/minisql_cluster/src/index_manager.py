@@ -43,18 +43,20 @@ def _decode_sequence(sequence):
     return tuple(_decode(x) for x in sequence)
 
 
-def iter_chunk(sequence, offset, chunk_size, total_chunks):
-    """iterate a sequence in chunks, beginning from offset"""
-    for i in range(total_chunks):
-        yield sequence[offset + i * chunk_size: offset + (i + 1) * chunk_size]
+def _pinned_node(manager, index_file_path, block_offset, node_blocks):
+    """pin the blocks of a node; a node of a single block is pinned as a plain block"""
+    if node_blocks == 1:
+        return manager.pinned(index_file_path, block_offset)
+    return manager.pinned_span(index_file_path, block_offset, node_blocks)
 
 
 class LeafIterator:
-    def __init__(self, Node, index_file_path, node, key_position):
+    def __init__(self, Node, index_file_path, node, key_position, node_blocks=1):
         self.Node = Node
         self.index_file_path = index_file_path
         self.node = node
         self.key_position = key_position
+        self.node_blocks = node_blocks
         self.manager = BufferManager()
 
     def __iter__(self):
@@ -70,22 +72,21 @@ class LeafIterator:
             if value == 0:
                 raise StopIteration
             else:
-                node_block = self.manager.get_file_block(self.index_file_path, value)
-                with pin(node_block):
+                with _pinned_node(self.manager, self.index_file_path, value, self.node_blocks) as node_block:
                     self.node = self.Node.frombytes(node_block.read())
                 self.key_position = 1
                 return self.node.keys[0], self.node.children[0]
 
 
-def node_factory(fmt):
-    """receive a format string, return a Node class"""
+def node_factory(fmt, node_size=BufferManager.block_size):
+    """receive a format string and the size of a node in bytes, return a Node class"""
 
     class Node:
         key_struct = Struct(fmt)  # the struct to pack/unpack keys
         meta_struct = Struct('<3i')  # 3 ints: self.next_deleted, self.is_leaf, len(self.keys)
-        n = (BufferManager.block_size - 16) // (4 + key_struct.size)
+        n = (node_size - 16) // (4 + key_struct.size)
 
-        # n * key_size + 4 * (n + 1) + 4 + 4 + 4 <= block_size
+        # n * key_size + 4 * (n + 1) + 4 + 4 + 4 <= node_size
         #                -             -   -   -
         #                ^             ^   ^   ^
         #                |             /   |   \
@@ -99,22 +100,22 @@ def node_factory(fmt):
 
         def __bytes__(self):
             """the first are self.next_deleted, self.is_leaf, len(self.keys)
-            then the keys, then the children, padding to block size with zeroes"""
+            then the keys, then the children, padding to node size with zeroes"""
             key_bytes = b''.join(self.key_struct.pack(*_encode_sequence(x)) for x in self.keys)
             children_struct = Struct('<{}i'.format(len(self.keys) + 1))
             return (self.meta_struct.pack(self.next_deleted, self.is_leaf, len(self.keys))
                     + key_bytes +
-                    children_struct.pack(*self.children)).ljust(BufferManager.block_size, b'\0')
+                    children_struct.pack(*self.children)).ljust(node_size, b'\0')
 
         @classmethod
         def frombytes(cls, octets):
             """create a Node object from bytes"""
-            next_deleted, is_leaf, len_keys = cls.meta_struct.unpack(octets[:cls.meta_struct.size])
-            keys = [_decode_sequence(cls.key_struct.unpack(chunk))
-                    for chunk in iter_chunk(octets, cls.meta_struct.size, cls.key_struct.size, len_keys)]
-            children_struct = Struct('<{}i'.format(len_keys + 1))
+            next_deleted, is_leaf, len_keys = cls.meta_struct.unpack_from(octets, 0)
             children_offset = cls.meta_struct.size + len_keys * cls.key_struct.size
-            children = list(children_struct.unpack(octets[children_offset:children_offset + children_struct.size]))
+            keys = [_decode_sequence(key)
+                    for key in cls.key_struct.iter_unpack(octets[cls.meta_struct.size:children_offset])]
+            children_struct = Struct('<{}i'.format(len_keys + 1))
+            children = list(children_struct.unpack_from(octets, children_offset))
             return cls(is_leaf, keys, children, next_deleted)
 
         def insert(self, key, value):
@@ -193,52 +194,91 @@ def node_factory(fmt):
 
 
 class IndexManager:
-    def __init__(self, index_file_path, fmt):
+    # a node takes node_blocks consecutive blocks, a single one unless asked otherwise when the index is created;
+    # a larger node keeps a tree on wide keys shallow, which saves page reads on a cold buffer,
+    # but every node visited is decoded as a whole, so a lookup in a cached tree costs more cpu
+    # it is kept in the header of the index file
+    # a split or a merge pins up to 3 nodes at once, so a node takes a quarter of a shard of the buffer at most
+
+    @staticmethod
+    def node_blocks_of(node_size):
+        """the number of blocks of a node of node_size bytes, one if None
+        raise ValueError unless it is a block or a power of 2 of them up to 64, and fits the buffer"""
+        if node_size is None:
+            return 1
+        node_blocks, rest = divmod(node_size, BufferManager.block_size)
+        if rest or node_blocks not in (1, 2, 4, 8, 16, 32, 64):
+            raise ValueError('the node size must be 1, 2, 4, ... or 64 blocks, not {}B'.format(node_size))
+        if node_blocks * 4 > BufferManager().shard_capacity:
+            raise ValueError('a node of {}B takes more than a quarter of a shard of the buffer, {} blocks'.format(
+                node_size, BufferManager().shard_capacity))
+        return node_blocks
+
+    def __init__(self, index_file_path, fmt, node_size=None):
         """specify the path of the index file and the format of the keys, return a index manager
         if the index file exists, read data from the file
-        otherwise create it and initialize its header info
+        otherwise create it with nodes of node_size bytes, see node_blocks_of, a block by default,
+        and initialize its header info
         multiple index manager on the same file MUSTN'T simultaneously exist"""
-        self.Node = node_factory(fmt)
         self.index_file_path = index_file_path
         self._manager = BufferManager()
-        self.meta_struct = Struct('<4i')  # total blocks, offset of the first deleted block, offset of the root node
+        # total blocks, offset of the first deleted block, offset of the root node, offset of the first leaf,
+        # blocks per node, which is 0 in the files made before nodes could take more than a block
+        self.meta_struct = Struct('<5i')
         try:
-            meta_block = self._manager.get_file_block(self.index_file_path, 0)
-            with pin(meta_block):
-                self.total_blocks, self.first_deleted_block, self.root, self.first_leaf = self.meta_struct.unpack(
-                    meta_block.read()[:self.meta_struct.size])
+            with self._manager.pinned(self.index_file_path, 0) as meta_block:
+                (self.total_blocks, self.first_deleted_block, self.root, self.first_leaf,
+                 self.node_blocks) = self.meta_struct.unpack_from(meta_block.read(), 0)
+            self.node_blocks = self.node_blocks or 1
         except FileNotFoundError:  # create and initialize an index file if not exits
-            self.total_blocks, self.first_deleted_block, self.root, self.first_leaf = 1, 0, 0, 0
+            node_blocks = self.node_blocks_of(node_size)
+            self.node_blocks = node_blocks
+            # the header takes a whole node, so that every node is aligned on its size and never crosses an extent
+            self.total_blocks, self.first_deleted_block, self.root, self.first_leaf = node_blocks, 0, 0, 0
             with open(index_file_path, 'wb') as f:
                 f.write(self.meta_struct.pack(self.total_blocks,
                                               self.first_deleted_block,
                                               self.root,
-                                              self.first_leaf).ljust(BufferManager.block_size, b'\0'))
+                                              self.first_leaf,
+                                              self.node_blocks).ljust(BufferManager.block_size, b'\0'))
+            self._manager.invalidate(index_file_path)  # blocks left from a former file of the same name
+        self.Node = node_factory(fmt, self.node_blocks * BufferManager.block_size)
 
     def dump_header(self):
         """write the header info to the index file
         MUST be called before the program exits,
         otherwise the header info in the file won't be updated"""
-        meta_block = self._manager.get_file_block(self.index_file_path, 0)
-        with pin(meta_block):
-            meta_block.write(self.meta_struct.pack(self.total_blocks,
-                                                   self.first_deleted_block,
-                                                   self.root,
-                                                   self.first_leaf).ljust(BufferManager.block_size, b'\0'))
+        with self._manager.pinned(self.index_file_path, 0) as meta_block:
+            meta_block.pack_into(self.meta_struct, 0,
+                                 self.total_blocks,
+                                 self.first_deleted_block,
+                                 self.root,
+                                 self.first_leaf,
+                                 self.node_blocks)
+
+    def _get_node_block(self, block_offset):
+        """return the block of a node, or the BlockSpan of its blocks"""
+        if self.node_blocks == 1:
+            return self._manager.get_file_block(self.index_file_path, block_offset)
+        return self._manager.get_file_span(self.index_file_path, block_offset, self.node_blocks)
+
+    def _pinned_node(self, block_offset):
+        return _pinned_node(self._manager, self.index_file_path, block_offset, self.node_blocks)
 
     def _get_free_block(self):
         """return a free block and update header info, assuming this block will be used"""
         if self.first_deleted_block > 0:
             block_offset = self.first_deleted_block
-            block = self._manager.get_file_block(self.index_file_path, block_offset)
+            block = self._get_node_block(block_offset)
             s = Struct('<i')
-            next_deleted = s.unpack(block.read()[:s.size])[0]
+            with pin(block):
+                next_deleted = s.unpack_from(block.read(), 0)[0]
             self.first_deleted_block = next_deleted
             return block
         else:
             block_offset = self.total_blocks
-            block = self._manager.get_file_block(self.index_file_path, block_offset)
-            self.total_blocks += 1
+            block = self._get_node_block(block_offset)
+            self.total_blocks += self.node_blocks
             return block
 
     def _delete_node(self, node, block):
@@ -256,8 +296,7 @@ class IndexManager:
         node_block_offset = self.root
         path_to_parents = []
         while True:  # find the insert position
-            node_block = self._manager.get_file_block(self.index_file_path, node_block_offset)
-            with pin(node_block):
+            with self._pinned_node(node_block_offset) as node_block:
                 node = self.Node.frombytes(node_block.read())
                 if node.is_leaf:
                     return node, node_block, path_to_parents
@@ -266,6 +305,24 @@ class IndexManager:
                     child_index = bisect.bisect_right(node.keys, key)
                     node_block_offset = node.children[child_index]
 
+    def _find_leaf_bounded(self, key):
+        """like _find_leaf, but also return the smallest key of the parents greater than key,
+        which no key of the leaf reaches, or None for the last leaf"""
+        node_block_offset = self.root
+        path_to_parents = []
+        upper_bound = None
+        while True:
+            with self._pinned_node(node_block_offset) as node_block:
+                node = self.Node.frombytes(node_block.read())
+                if node.is_leaf:
+                    return node, node_block, path_to_parents, upper_bound
+                else:
+                    path_to_parents.append(node_block_offset)
+                    child_index = bisect.bisect_right(node.keys, key)
+                    if child_index < len(node.keys):
+                        upper_bound = node.keys[child_index]
+                    node_block_offset = node.children[child_index]
+
     def _handle_overflow(self, node, block, path_to_parents):
         if not path_to_parents:  # the root overflowed
             new_block = self._get_free_block()
@@ -288,8 +345,8 @@ class IndexManager:
             with pin(block), pin(new_block):
                 block.write(bytes(node))
                 new_block.write(bytes(new_node))
-            parent_block = self._manager.get_file_block(self.index_file_path, parent_offset)
-            parent_node = self.Node.frombytes(parent_block.read())
+            with self._pinned_node(parent_offset) as parent_block:
+                parent_node = self.Node.frombytes(parent_block.read())
             parent_node.insert(key, value)
             if len(parent_node.keys) <= self.Node.n:
                 with pin(parent_block):
@@ -316,16 +373,13 @@ class IndexManager:
             return  # root underflow is not a problem
 
         parent_offset = path_to_parents.pop()
-        parent_block = self._manager.get_file_block(self.index_file_path, parent_offset)
-        with pin(parent_block):
+        with self._pinned_node(parent_offset) as parent_block:
             parent = self.Node.frombytes(parent_block.read())
             my_position = bisect.bisect_right(parent.keys, node.keys[0])
 
         if my_position > 0:  # try find the left sibling
             left_sibling_offset = parent.children[my_position - 1]
-            left_sibling_block = self._manager.get_file_block(self.index_file_path,
-                                                              left_sibling_offset)
-            with pin(left_sibling_block):
+            with self._pinned_node(left_sibling_offset) as left_sibling_block:
                 left_sibling = self.Node.frombytes(left_sibling_block.read())
             if len(left_sibling.keys) > ceil(node.n / 2):  # a transfer is possible
                 node.transfer_from_left(left_sibling, parent, my_position - 1)
@@ -339,9 +393,7 @@ class IndexManager:
 
         if my_position < len(parent.keys) - 1:  # try find the right sibling
             right_sibling_offset = parent.children[my_position + 1]
-            right_sibling_block = self._manager.get_file_block(self.index_file_path,
-                                                               right_sibling_offset)
-            with pin(right_sibling_block):
+            with self._pinned_node(right_sibling_offset) as right_sibling_block:
                 right_sibling = self.Node.frombytes(right_sibling_block.read())
             if len(right_sibling.keys) > ceil(node.n / 2):  # a transfer is possible
                 node.transfer_from_right(right_sibling, parent, my_position)
@@ -382,7 +434,7 @@ class IndexManager:
         else:
             node, node_block, path_to_parents = self._find_leaf(key)
             key_position = bisect.bisect_left(node.keys, key)
-            return LeafIterator(self.Node, self.index_file_path, node, key_position)
+            return LeafIterator(self.Node, self.index_file_path, node, key_position, self.node_blocks)
 
     def insert(self, key, value):
         """insert a key-value pair into the index file
@@ -409,6 +461,45 @@ class IndexManager:
             else:  # split
                 self._handle_overflow(node, node_block, path_to_parents)
 
+    def insert_many(self, items):
+        """insert key-value pairs in a batch, in the order of the keys,
+        so that the keys going into the same leaf are inserted into it at once,
+        with the leaf read and written once rather than once for every key
+        if a key is already in this index, or given twice, raise ValueError and leave the index as it was"""
+        items = sorted((_convert_to_tuple(key), value) for key, value in items)
+        inserted = 0
+        try:
+            while inserted < len(items):
+                key, value = items[inserted]
+                if self.root == 0:
+                    self.insert(key, value)
+                    inserted += 1
+                    continue
+                node, node_block, path_to_parents, upper_bound = self._find_leaf_bounded(key)
+                changed = False
+                try:
+                    while inserted < len(items):
+                        key, value = items[inserted]
+                        if upper_bound is not None and key >= upper_bound:
+                            break
+                        key_position = bisect.bisect_left(node.keys, key)
+                        if key_position < len(node.keys) and node.keys[key_position] == key:
+                            raise ValueError('duplicate key {}'.format(key))
+                        node.insert(key, value)
+                        changed = True
+                        inserted += 1
+                        if len(node.keys) > node.n:
+                            break
+                finally:
+                    if len(node.keys) > node.n:  # split, the next key is searched from the root again
+                        self._handle_overflow(node, node_block, path_to_parents)
+                    elif changed:
+                        node_block.write(bytes(node))
+        except ValueError:
+            for key, value in items[:inserted]:
+                self.delete(key)
+            raise
+
     def delete(self, key):
         """delete the key-value pair with key equal the parameter
         if the index file has no such key, raise ValueError"""
@@ -433,6 +524,6 @@ class IndexManager:
         """return an iterator at the beginning of the leaf node chain"""
         if self.first_leaf == 0:
             raise RuntimeError('can\'t iter from empty index')
-        first_leaf_block = self._manager.get_file_block(self.index_file_path, self.first_leaf)
-        first_leaf = self.Node.frombytes(first_leaf_block.read())
-        return LeafIterator(self.Node, self.index_file_path, first_leaf, 0)
+        with self._pinned_node(self.first_leaf) as first_leaf_block:
+            first_leaf = self.Node.frombytes(first_leaf_block.read())
+        return LeafIterator(self.Node, self.index_file_path, first_leaf, 0, self.node_blocks)
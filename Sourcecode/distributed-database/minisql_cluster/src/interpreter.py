@@ -1,3 +1,4 @@
+import itertools
 import sys
 
 import ply.lex as lex
@@ -8,7 +9,7 @@ from minisql_cluster.src.facade import MinisqlFacade
 reserved = (
     'SELECT', 'CREATE', 'INSERT', 'DELETE', 'DROP', 'TABLE', 'PRIMARY', 'KEY',
     'UNIQUE', 'INT', 'CHAR', 'FLOAT', 'ON', 'FROM', 'QUIT', 'VALUES', 'INTO',
-    'INDEX', 'WHERE', 'AND', 'OR', 'EXECUTE',
+    'INDEX', 'WHERE', 'AND', 'OR', 'EXECUTE', 'LIMIT', 'WITH',
 )
 
 tokens = reserved + \
@@ -104,7 +105,8 @@ def p_sql_statement(p):
                         | quit_statement
                         | execute_statement
     '''
-    pass
+    # parser.parse() returns the number of records an insert added, 0 if it failed, None for any other statement
+    p[0] = p[1]
 
 
 def p_create_statement(p):
@@ -114,9 +116,16 @@ def p_create_statement(p):
     '''
     type_code = p[1]['type']
     if type_code == 'create_index':
-        MinisqlFacade.create_index(p[1]['table_name'], p[1]['index_name'], p[1]['column_name'])
-        add_result('create index successfully!')
-        set_result_flag()
+        try:
+            options = dict(p[1]['options'])
+            node_size = options.pop('node_size', None)
+            if options:
+                raise ValueError('Unknown index option {}'.format(', '.join(options)))
+            MinisqlFacade.create_index(p[1]['table_name'], p[1]['index_name'], p[1]['column_name'], node_size)
+            add_result('create index successfully!')
+            set_result_flag()
+        except ValueError as value_error:
+            add_result('Error! {}'.format(value_error))
     elif type_code == 'create_table':
         try:
             if p[1]['primary']:
@@ -131,13 +140,19 @@ def p_create_statement(p):
 
 def p_insert_statement(p):
     '''
-        insert_statement : INSERT INTO ID VALUES LPAREN value_list RPAREN SEMICOLON
+        insert_statement : INSERT INTO ID VALUES row_list SEMICOLON
     '''
     table_name = p[3]
-    value_list = p[6]
+    row_list = p[5]
+    p[0] = 0  # the number of records inserted
     try:
-        MinisqlFacade.insert_record(table_name, value_list)
-        add_result('insert successfully!')
+        if len(row_list) == 1:
+            MinisqlFacade.insert_record(table_name, row_list[0])
+            add_result('insert successfully!')
+        else:
+            MinisqlFacade.insert_records(table_name, row_list)
+            add_result('insert {} records successfully!'.format(len(row_list)))
+        p[0] = len(row_list)
         set_result_flag()
     except KeyError as key_error:
         add_result('Insertion failed.')
@@ -154,12 +169,15 @@ def p_select_statement(p):
     '''
     type_code = p[1]['type']
     try:
-        columns = MinisqlFacade.get_columns_name(p[1]['table_name'])
+        columns = p[1]['columns'] or MinisqlFacade.get_columns_name(p[1]['table_name'])
         columns_format = ' | '.join(column for column in columns)
         if type_code == 'select_all':
-            records = MinisqlFacade.select_record_all(p[1]['table_name'])
+            records = MinisqlFacade.select_record_all(p[1]['table_name'], p[1]['columns'])
         else:  # conditional select
-            records = MinisqlFacade.select_record_conditionally(p[1]['table_name'], p[1]['conditions'])
+            records = MinisqlFacade.select_record_conditionally(p[1]['table_name'], p[1]['conditions'],
+                                                                p[1]['columns'])
+        if p[1]['limit'] is not None:  # the records are read lazily, so no more than needed are read
+            records = itertools.islice(records, p[1]['limit'])
         add_result('*****' * len(columns))
         add_result(columns_format)
         add_result('*****' * len(columns))
@@ -169,6 +187,8 @@ def p_select_statement(p):
         set_result_flag()
     except KeyError:
         add_result('Error! The table {} is not exist!'.format(p[1]['table_name']))
+    except ValueError as value_error:
+        add_result('Error! {}'.format(value_error))
 
 
 def p_delete_statement(p):
@@ -243,16 +263,26 @@ def p_create_table(p):
 
 def p_create_index(p):
     '''
-        create_index : CREATE INDEX ID ON ID LPAREN ID RPAREN SEMICOLON
+        create_index : CREATE INDEX ID ON ID LPAREN ID RPAREN index_options SEMICOLON
     '''
     dict = {}
     dict['type'] = 'create_index'
     dict['index_name'] = p[3]
     dict['table_name'] = p[5]
     dict['column_name'] = p[7]
+    dict['options'] = p[9]
     p[0] = dict
 
 
+def p_index_options(p):
+    '''
+        index_options : WITH LPAREN ID EQ ICONST RPAREN
+                      | empty
+    '''
+    # e.g. with (node_size = 16384), the size in bytes of the nodes of the B+ tree
+    p[0] = {p[3].lower(): p[5]} if len(p) == 7 else {}
+
+
 def p_column_list(p):
     '''
         column_list : column
@@ -300,6 +330,18 @@ def p_primary_clause(p):
 
 
 # Rules for insert statement
+def p_row_list(p):
+    '''
+        row_list : LPAREN value_list RPAREN
+                | row_list COMMA LPAREN value_list RPAREN
+    '''
+    if len(p) == 4:
+        p[0] = [p[2]]
+    else:
+        p[0] = p[1]
+        p[0].append(p[4])
+
+
 def p_value_list(p):
     '''
         value_list : value
@@ -325,25 +367,64 @@ def p_value(p):
 # Rules for select statement
 def p_select_all(p):
     '''
-        select_all : SELECT STAR FROM ID SEMICOLON
+        select_all : SELECT select_list FROM ID limit_clause SEMICOLON
     '''
     dict = {}
     dict['type'] = 'select_all'
+    dict['columns'] = p[2]
     dict['table_name'] = p[4]
+    dict['limit'] = p[5]
     p[0] = dict
 
 
 def p_conditional_select(p):
     '''
-        conditional_select : SELECT STAR FROM ID WHERE conditions SEMICOLON
+        conditional_select : SELECT select_list FROM ID WHERE conditions limit_clause SEMICOLON
     '''
     dict = {}
     dict['type'] = 'conditional_select'
+    dict['columns'] = p[2]
     dict['table_name'] = p[4]
     dict['conditions'] = p[6]
+    dict['limit'] = p[7]
     p[0] = dict
 
 
+def p_select_list(p):
+    '''
+        select_list : STAR
+                    | id_list
+    '''
+    p[0] = None if p[1] == '*' else p[1]  # the names of the columns, None for all
+
+
+def p_id_list(p):
+    '''
+        id_list : ID
+                | id_list COMMA ID
+    '''
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[0] = p[1]
+        p[0].append(p[3])
+
+
+def p_limit_clause(p):
+    '''
+        limit_clause : LIMIT ICONST
+                    | empty
+    '''
+    p[0] = p[2] if len(p) == 3 else None  # the number of records at most, None for all
+
+
+def p_empty(p):
+    '''
+        empty :
+    '''
+    pass
+
+
 def p_conditions(p):
     '''
         conditions : condition
@@ -486,11 +567,14 @@ def clear_result():
 
 def zookeeper_result(zk, result_path, server_name):
     global result
-    zk.set(result_path, bytes(bytearray(server_name + ":\n", encoding="utf-8") + result))
+    payload = bytes(bytearray(server_name + ":\n", encoding="utf-8") + result)
+    # the result is published only once the changes of the statement are durable in the log
+    MinisqlFacade.commit(lambda: zk.set(result_path, payload))
     result = bytearray()
 
 
 if __name__ == '__main__':
+    MinisqlFacade.start()
     while True:
         sql = cmd_get_sql()
         parser.parse(sql)
@@ -0,0 +1,268 @@
+import os
+import threading
+import zlib
+from struct import Struct
+
+from minisql_cluster.src.buffer_manager import Singleton
+
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+
+class LogManager(Singleton):
+    """a redo-only write-ahead log of the page changes made through the buffer manager
+
+    every change of a block is appended as a physical after-image: the file, the byte position and the new bytes
+    replaying such records in order is idempotent, so recovery simply re-applies every intact record
+    the log sits below RecordManager and IndexManager, so neither of them knows about it
+
+    the log is written and fsynced by a writer thread, every fsync_interval seconds,
+    or as soon as group_commit_size statements are waiting to commit, whichever comes first,
+    so one fsync makes a whole group of statements durable (group commit)
+    the callbacks of the statements are run by the writer thread, or the committing thread without one,
+    never while a latch of the buffer manager is held, and a failing callback doesn't hold back the others
+    the buffer manager forces the log up to the last change of a block before writing the block back (the WAL rule),
+    so pages can be flushed lazily
+
+    the log file starts with the lsn of its first record; a checkpoint of the buffer manager discards
+    the records before its redo point by rewriting the log from there, so recovery only replays the tail"""
+    log_path = 'schema/wal.log'
+    fsync_interval = 0.01  # seconds a commit waits at most for the rest of its group
+    group_commit_size = 64  # statements waiting to commit that force the log at once
+
+    file_header = Struct('<q')  # the lsn at the beginning of the records in the file
+    # crc32 of the rest of the record, then length of data, file position, kind, length of path
+    crc_struct = Struct('<I')
+    record_header = Struct('<IqBH')
+    WRITE = 0  # data is written to the file at the position
+    DROP = 1  # the file is deleted; earlier records of it must not be replayed
+
+    @classmethod
+    def configure(cls, environ=None):
+        """set the group commit from the environment, which must happen before the log is created
+        MINISQL_LOG_FSYNC_INTERVAL in seconds, e.g. 0.002, and MINISQL_LOG_GROUP_COMMIT_SIZE in statements"""
+        environ = os.environ if environ is None else environ
+        fsync_interval = float(environ.get('MINISQL_LOG_FSYNC_INTERVAL', cls.fsync_interval))
+        group_commit_size = int(environ.get('MINISQL_LOG_GROUP_COMMIT_SIZE', cls.group_commit_size))
+        if not fsync_interval > 0:
+            raise ValueError('fsync interval must be positive, not {}'.format(fsync_interval))
+        if group_commit_size < 1:
+            raise ValueError('group commit size must be at least 1, not {}'.format(group_commit_size))
+        cls.fsync_interval, cls.group_commit_size = fsync_interval, group_commit_size
+
+    def __init__(self):
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        if not os.path.exists(self.log_path):
+            self._create(0, b'')
+        self._fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND)
+        self._base, = self.file_header.unpack(os.pread(self._fd, self.file_header.size, 0))
+        self._lock = threading.Lock()  # guards the tail of the log in memory
+        self._io_lock = threading.Lock()  # serializes the writes and fsyncs
+        self._buffer = bytearray()  # records not written to the log file yet
+        # the log sequence number is the end position of a record in the log, as if it were never truncated
+        self._lsn = self._base + os.fstat(self._fd).st_size - self.file_header.size
+        self._durable_lsn = self._lsn
+        self._waiting = []  # (lsn, callback) of the statements waiting for the next fsync
+        self._writer = None  # (thread, stop event)
+        self._wakeup = threading.Event()
+
+    @property
+    def lsn(self):
+        """the lsn of the last record appended, i.e. where the next one begins"""
+        return self._lsn
+
+    @property
+    def durable_lsn(self):
+        return self._durable_lsn
+
+    @property
+    def size(self):
+        """bytes of log to be replayed by a recovery"""
+        return self._lsn - self._base
+
+    def append(self, file_path, position, data, kind=WRITE):
+        """append a record of a change and return its lsn; the record is not durable yet"""
+        path = file_path.encode('utf-8')
+        body = self.record_header.pack(len(data), position, kind, len(path)) + path + data
+        with self._lock:
+            self._buffer += self.crc_struct.pack(zlib.crc32(body))
+            self._buffer += body
+            self._lsn += self.crc_struct.size + len(body)
+            return self._lsn
+
+    def log_drop(self, file_path):
+        """record that a table or index file is deleted, so that recovery won't write into a new file of that name"""
+        return self.append(os.path.abspath(file_path), 0, b'', self.DROP)
+
+    def flush_to(self, lsn):
+        """make the log durable at least up to lsn
+        called by the buffer manager under its latches, so the callbacks of the statements made durable
+        are left to the writer thread, or to the next commit without one"""
+        if lsn > self._durable_lsn:
+            self._sync()
+            if self._waiting:
+                self._wakeup.set()
+
+    def commit(self, callback=None):
+        """mark the end of a statement; callback is called once everything logged so far is durable
+        without a writer thread, the log is forced at once"""
+        with self._lock:
+            if self._lsn <= self._durable_lsn:
+                waiting = False
+            else:
+                waiting = True
+                self._waiting.append((self._lsn, callback))
+                if len(self._waiting) >= self.group_commit_size:
+                    self._wakeup.set()
+        if not waiting:
+            if callback is not None:
+                callback()
+        elif self._writer is None:
+            self._sync()
+            self._acknowledge()
+
+    def _sync(self):
+        # write the log and fsync it; the callbacks are run apart, by _acknowledge
+        with self._io_lock:
+            lsn = self._write()
+            if lsn > self._durable_lsn:
+                _fdatasync(self._fd)
+                self._durable_lsn = lsn
+
+    def _acknowledge(self):
+        # run the callbacks of the statements made durable, each of them even if another one fails
+        with self._lock:
+            durable = [callback for lsn, callback in self._waiting if lsn <= self._durable_lsn]
+            self._waiting = [(lsn, callback) for lsn, callback in self._waiting if lsn > self._durable_lsn]
+        for callback in durable:
+            if callback is not None:
+                try:
+                    callback()
+                except Exception as error:  # e.g. the zookeeper node is gone, the statement is durable anyway
+                    print('log writer: callback failed: {!r}'.format(error))
+
+    def _write(self):
+        # write the records in memory to the log file, without waiting for the disk, and return the lsn reached
+        # the caller holds _io_lock
+        with self._lock:
+            data, self._buffer = self._buffer, bytearray()
+            lsn = self._lsn
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        return lsn
+
+    def start(self):
+        """start the writer thread that performs group commits"""
+        if self._writer is None:
+            stop = threading.Event()
+            thread = threading.Thread(target=self._writer_loop, args=(stop,), name='log-writer', daemon=True)
+            self._writer = (thread, stop)
+            thread.start()
+
+    def stop(self):
+        """stop the writer thread; everything logged so far is made durable"""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            thread, stop = writer
+            stop.set()
+            self._wakeup.set()
+            thread.join()
+        self._sync()
+        self._acknowledge()
+
+    def _writer_loop(self, stop):
+        while not stop.is_set():
+            self._wakeup.wait(self.fsync_interval)
+            self._wakeup.clear()
+            try:
+                self._sync()
+            except OSError as error:  # the waiting statements are acknowledged by the next successful fsync
+                print('log writer: {}'.format(error))
+            self._acknowledge()
+
+    def reset(self):
+        """empty the log file; only safe when every change logged so far has reached the data files durably"""
+        self.truncate(self._lsn)
+
+    def truncate(self, redo_lsn):
+        """discard the records before redo_lsn, which must be the lsn of a record boundary,
+        once every change before it has reached the data files durably
+        the tail is copied into a new log file that atomically replaces the old one,
+        so a crash at any moment leaves either log behind, both of which recover correctly
+        the lsn keeps growing, so the lsn of the cached blocks stay comparable"""
+        with self._io_lock:
+            self._write()  # so that redo_lsn is inside the file
+            begin = redo_lsn - self._base
+            if begin <= 0:
+                return
+            with open(self.log_path, 'rb') as log:
+                log.seek(self.file_header.size + begin)
+                tail = log.read()
+            self._create(redo_lsn, tail)
+            fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND)
+            os.close(self._fd)
+            self._fd = fd
+            self._base = redo_lsn
+
+    def _create(self, base, records):
+        # (re)create the log file holding the records, which begin at lsn base
+        temp_path = self.log_path + '.tmp'
+        with open(temp_path, 'wb') as log:
+            log.write(self.file_header.pack(base))
+            log.write(records)
+            log.flush()
+            os.fsync(log.fileno())
+        os.replace(temp_path, self.log_path)
+        directory = os.open(os.path.dirname(os.path.abspath(self.log_path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _records(self):
+        """iterate (lsn, kind, path, position, data) of the intact records in the log file
+        the iteration stops at the first torn or corrupted record, which marks the end of the log"""
+        with open(self.log_path, 'rb') as file:
+            log = file.read()
+        base = self._base - self.file_header.size  # lsn = base + position in the file
+        header_size = self.crc_struct.size + self.record_header.size
+        offset = self.file_header.size
+        while offset + header_size <= len(log):
+            crc, = self.crc_struct.unpack_from(log, offset)
+            data_size, position, kind, path_size = self.record_header.unpack_from(log, offset + self.crc_struct.size)
+            end = offset + header_size + path_size + data_size
+            if end > len(log) or zlib.crc32(log[offset + self.crc_struct.size:end]) != crc:
+                break
+            path = log[offset + header_size:offset + header_size + path_size].decode('utf-8')
+            yield base + end, kind, path, position, log[end - data_size:end]
+            offset = end
+
+    def recover(self):
+        """replay the log, which begins at the redo point of the last checkpoint, into the data files,
+        make them durable and reset the log
+        must be called before the buffer manager caches any block; return the number of records replayed"""
+        records = list(self._records())
+        last_drop = {path: lsn for lsn, kind, path, _, _ in records if kind == self.DROP}
+        fds = {}
+        replayed = 0
+        try:
+            for lsn, kind, path, position, data in records:
+                if kind != self.WRITE or lsn < last_drop.get(path, 0):
+                    continue
+                if path not in fds:
+                    try:
+                        fds[path] = os.open(path, os.O_RDWR)
+                    except FileNotFoundError:  # deleted after the change, by a DDL that didn't log it
+                        fds[path] = None
+                if fds[path] is not None:
+                    os.pwrite(fds[path], data, position)
+                    replayed += 1
+            for fd in fds.values():
+                if fd is not None:
+                    os.fsync(fd)
+        finally:
+            for fd in fds.values():
+                if fd is not None:
+                    os.close(fd)
+        self.reset()
+        return replayed
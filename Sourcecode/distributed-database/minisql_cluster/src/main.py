@@ -1,4 +1,5 @@
 import hashlib
+import json
 import logging
 import math
 import random
@@ -10,7 +11,7 @@ from time import sleep
 from kazoo.client import KazooClient
 
 # hosts = '172.16.238.2:2181,172.16.238.3:2182,172.16.238.4:2183'
-from interpreter import parser, clear_result, get_result, zookeeper_result, get_result_flag
+from interpreter import parser, clear_result, get_result, zookeeper_result, get_result_flag, MinisqlFacade
 
 hosts = '127.0.0.1:2181,127.0.0.1:2182,127.0.0.1:2183'
 # test_hosts = '127.0.0.1:2181'
@@ -22,6 +23,8 @@ server_path = "/servers/" + server_name
 zk = KazooClient(hosts=hosts, logger=logging)
 server_num = 0
 server_list = []
+# 缓冲池统计信息的发布间隔（秒）
+stats_interval = 10
 
 
 # 删除断线服务器相关节点
@@ -112,13 +115,15 @@ def watch_instruction_children(children):
             if data_str.find('copy') == 0:
                 copy_flag = True
                 data_str = data_str.replace('copy', '')
-            parser.parse(data_str)
+            # insert语句返回插入的行数
+            inserted = parser.parse(data_str)
             # 如果执行成功，更新相关信息 /info
             if get_result_flag():
-                update_info(data_str, ch)
+                update_info(data_str, ch, inserted)
             # 如果是容错容灾相关，则不需要写回结果，直接删除指令节点
             if copy_flag:
-                zk.delete('{}/instructions/{}'.format(server_path, ch), recursive=True)
+                instruction_path = '{}/instructions/{}'.format(server_path, ch)
+                MinisqlFacade.commit(lambda path=instruction_path: zk.delete(path, recursive=True))
                 print(get_result())
                 clear_result()
             # 正常情况下，需要写回指令
@@ -128,7 +133,7 @@ def watch_instruction_children(children):
 
 
 # 处理各种指令导致的信息更新，delete由于minisql的问题还不完善
-def update_info(sql, node_name):
+def update_info(sql, node_name, inserted=None):
     tmp = re.sub(r'[;()]', ' ', sql).strip(' ').split()
     if tmp[0] == 'create':
         if tmp[1] == 'table':
@@ -144,7 +149,8 @@ def update_info(sql, node_name):
             zk.set('{}/tables/{}/{}'.format(server_path, tmp[4], node_name), bytes(sql, encoding='utf-8'))
     elif tmp[0] == 'insert':
         data, stat = zk.get('{}/info/recordNum'.format(server_path))
-        num = int(data.decode('utf-8')) + 1
+        # 一条insert可以插入多行
+        num = int(data.decode('utf-8')) + (inserted or 0)
         zk.set('{}/info/recordNum'.format(server_path), bytes(str(num), encoding='utf-8'))
     elif tmp[0] == 'delete':
         data, stat = zk.get('{}/info/recordNum'.format(server_path))
@@ -165,7 +171,24 @@ def update_info(sql, node_name):
             # zk.create('{}/tables/{}/{}'.format(server_path, tmp[2], node_name), bytes(sql, encoding='utf-8'))
 
 
+# 发布缓冲池的统计信息（命中、未命中、换出、回写等），用于根据数据确定缓冲池大小
+def publish_buffer_stats():
+    zk.set('{}/info/bufferStats'.format(server_path),
+           bytes(json.dumps(MinisqlFacade.buffer_stats()), encoding='utf-8'))
+
+
+# 监听缓冲池大小的配置节点，运行时调整缓冲池大小（如 256M）
+def watch_buffer_size(data, stat):
+    if data:
+        try:
+            MinisqlFacade.resize_buffer(data.decode('utf-8'))
+        except ValueError as e:
+            print('resize buffer: {}'.format(e))
+
+
 if __name__ == '__main__':
+    # 启动存储引擎的后台线程（脏页回写）
+    MinisqlFacade.start()
     # 开始心跳
     zk.start()
     # party部分，用于检测服务器断线情况
@@ -184,11 +207,19 @@ if __name__ == '__main__':
         zk.create("{}/info/recordNum".format(server_path), b'0')
     if not zk.exists("{}/info/tableNum".format(server_path)):
         zk.create("{}/info/tableNum".format(server_path), b'0')
+    zk.ensure_path("{}/info/bufferStats".format(server_path))
+    zk.ensure_path("{}/config/bufferSize".format(server_path))
+    zk.DataWatch("{}/config/bufferSize".format(server_path), watch_buffer_size)
     zk.delete("{}/instructions".format(server_path), recursive=True)
     zk.ensure_path("{}/instructions".format(server_path))
     # 监听指令节点
     zk.ChildrenWatch(server_path + "/instructions", watch_instruction_children)
 
+    watching = 0
     while True:
-        sleep(60)
-        print("Watching...")
+        sleep(stats_interval)
+        publish_buffer_stats()
+        watching += stats_interval
+        if watching >= 60:
+            watching = 0
+            print("Watching...")
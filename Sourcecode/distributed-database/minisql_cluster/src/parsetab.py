@@ -6,9 +6,9 @@ _tabversion = '3.10'
 
 _lr_method = 'LALR'
 
-_lr_signature = 'AND CHAR COMMA CREATE DELETE DOT DROP EQ EXECUTE FCONST FLOAT FROM GE GT ICONST ID INDEX INSERT INT INTO KEY LE LPAREN LT NE ON OR PRIMARY QUIT RPAREN SCONST SELECT SEMICOLON STAR TABLE UNIQUE VALUES WHERE\n        sql_statement : create_statement\n                        | insert_statement\n                        | select_statement\n                        | delete_statement\n                        | drop_statement\n                        | quit_statement\n                        | execute_statement\n    \n        create_statement : create_table\n                          | create_index\n    \n        insert_statement : INSERT INTO ID VALUES LPAREN value_list RPAREN SEMICOLON\n    \n        select_statement : select_all\n                        | conditional_select\n    \n        delete_statement : delete_all\n                        | conditional_delete\n    \n        drop_statement : drop_table\n                        | drop_index\n    \n        quit_statement : QUIT SEMICOLON\n    \n        create_table : CREATE TABLE ID LPAREN column_list RPAREN SEMICOLON\n                    | CREATE TABLE ID LPAREN column_list COMMA primary_clause RPAREN SEMICOLON\n    \n        create_index : CREATE INDEX ID ON ID LPAREN ID RPAREN SEMICOLON\n    \n        column_list : column\n                    | column_list COMMA column\n    \n        column :  ID column_type\n                | ID column_type UNIQUE\n    \n        column_type : INT\n                    | FLOAT\n                    | CHAR LPAREN ICONST RPAREN\n    \n        primary_clause : PRIMARY KEY LPAREN ID RPAREN\n    \n        value_list : value\n                    | value_list COMMA value\n    \n        value : ICONST\n                | FCONST\n                | SCONST\n    \n        select_all : SELECT STAR FROM ID SEMICOLON\n    \n        conditional_select : SELECT STAR FROM ID WHERE conditions SEMICOLON\n    \n        conditions : condition\n                    | conditions AND condition\n                    | conditions OR condition\n    \n        condition :  ID GT value\n                    | ID LT value\n                    | ID EQ value\n                    | ID GE value\n                    | ID LE value\n                    | ID NE value\n    \n        delete_all : DELETE FROM ID SEMICOLON\n    \n        conditional_delete : DELETE FROM ID WHERE conditions SEMICOLON\n    \n        drop_table : DROP TABLE ID SEMICOLON\n    \n        drop_index : DROP INDEX ID SEMICOLON\n    \n        execute_statement : EXECUTE ID SEMICOLON\n                            | EXECUTE ID DOT ID SEMICOLON\n    '
+_lr_signature = 'AND CHAR COMMA CREATE DELETE DOT DROP EQ EXECUTE FCONST FLOAT FROM GE GT ICONST ID INDEX INSERT INT INTO KEY LE LIMIT LPAREN LT NE ON OR PRIMARY QUIT RPAREN SCONST SELECT SEMICOLON STAR TABLE UNIQUE VALUES WHERE WITH\n        sql_statement : create_statement\n                        | insert_statement\n                        | select_statement\n                        | delete_statement\n                        | drop_statement\n                        | quit_statement\n                        | execute_statement\n    \n        create_statement : create_table\n                          | create_index\n    \n        insert_statement : INSERT INTO ID VALUES row_list SEMICOLON\n    \n        select_statement : select_all\n                        | conditional_select\n    \n        delete_statement : delete_all\n                        | conditional_delete\n    \n        drop_statement : drop_table\n                        | drop_index\n    \n        quit_statement : QUIT SEMICOLON\n    \n        create_table : CREATE TABLE ID LPAREN column_list RPAREN SEMICOLON\n                    | CREATE TABLE ID LPAREN column_list COMMA primary_clause RPAREN SEMICOLON\n    \n        create_index : CREATE INDEX ID ON ID LPAREN ID RPAREN index_options SEMICOLON\n    \n        index_options : WITH LPAREN ID EQ ICONST RPAREN\n                      | empty\n    \n        column_list : column\n                    | column_list COMMA column\n    \n        column :  ID column_type\n                | ID column_type UNIQUE\n    \n        column_type : INT\n                    | FLOAT\n                    | CHAR LPAREN ICONST RPAREN\n    \n        primary_clause : PRIMARY KEY LPAREN ID RPAREN\n    \n        row_list : LPAREN value_list RPAREN\n                | row_list COMMA LPAREN value_list RPAREN\n    \n        value_list : value\n                    | value_list COMMA value\n    \n        value : ICONST\n                | FCONST\n                | SCONST\n    \n        select_all : SELECT select_list FROM ID limit_clause SEMICOLON\n    \n        conditional_select : SELECT select_list FROM ID WHERE conditions limit_clause SEMICOLON\n    \n        select_list : STAR\n                    | id_list\n    \n        id_list : ID\n                | id_list COMMA ID\n    \n        limit_clause : LIMIT ICONST\n                    | empty\n    \n        empty :\n    \n        conditions : condition\n                    | conditions AND condition\n                    | conditions OR condition\n    \n        condition :  ID GT value\n                    | ID LT value\n                    | ID EQ value\n                    | ID GE value\n                    | ID LE value\n                    | ID NE value\n    \n        delete_all : DELETE FROM ID SEMICOLON\n    \n        conditional_delete : DELETE FROM ID WHERE conditions SEMICOLON\n    \n        drop_table : DROP TABLE ID SEMICOLON\n    \n        drop_index : DROP INDEX ID SEMICOLON\n    \n        execute_statement : EXECUTE ID SEMICOLON\n                            | EXECUTE ID DOT ID SEMICOLON\n    '
     
-_lr_action_items = {'INSERT':([0,],[11,]),'QUIT':([0,],[18,]),'EXECUTE':([0,],[19,]),'CREATE':([0,],[20,]),'SELECT':([0,],[21,]),'DELETE':([0,],[22,]),'DROP':([0,],[23,]),'$end':([1,2,3,4,5,6,7,8,9,10,12,13,14,15,16,17,25,34,47,49,50,52,57,81,88,93,102,109,111,],[0,-1,-2,-3,-4,-5,-6,-7,-8,-9,-11,-12,-13,-14,-15,-16,-17,-49,-45,-47,-48,-50,-34,-46,-18,-35,-10,-19,-20,]),'INTO':([11,],[24,]),'SEMICOLON':([18,26,39,40,41,43,46,60,61,64,65,66,71,74,84,94,95,96,97,98,99,100,101,105,107,],[25,34,47,49,50,52,57,81,-36,-31,-32,-33,88,93,102,-39,-40,-41,-42,-43,-44,-37,-38,109,111,]),'ID':([19,24,27,28,30,31,32,35,38,44,45,48,58,72,73,82,83,110,],[26,33,36,37,39,40,41,43,46,53,56,59,59,53,92,59,59,112,]),'TABLE':([20,23,],[27,31,]),'INDEX':([20,23,],[28,32,]),'STAR':([21,],[29,]),'FROM':([22,29,],[30,38,]),'DOT':([26,],[35,]),'VALUES':([33,],[42,]),'LPAREN':([36,42,56,70,106,],[44,51,73,87,110,]),'ON':([37,],[45,]),'WHERE':([39,46,],[48,58,]),'ICONST':([51,75,76,77,78,79,80,85,87,],[64,64,64,64,64,64,64,64,104,]),'FCONST':([51,75,76,77,78,79,80,85,],[65,65,65,65,65,65,65,65,]),'SCONST':([51,75,76,77,78,79,80,85,],[66,66,66,66,66,66,66,66,]),'INT':([53,],[68,]),'FLOAT':([53,],[69,]),'CHAR':([53,],[70,]),'RPAREN':([54,55,62,63,64,65,66,67,68,69,86,89,90,92,103,104,108,112,113,],[71,-21,84,-29,-31,-32,-33,-23,-25,-26,-24,105,-22,107,-30,108,-27,113,-28,]),'COMMA':([54,55,62,63,64,65,66,67,68,69,86,90,103,108,],[72,-21,85,-29,-31,-32,-33,-23,-25,-26,-24,-22,-30,-27,]),'GT':([59,],[75,]),'LT':([59,],[76,]),'EQ':([59,],[77,]),'GE':([59,],[78,]),'LE':([59,],[79,]),'NE':([59,],[80,]),'AND':([60,61,64,65,66,74,94,95,96,97,98,99,100,101,],[82,-36,-31,-32,-33,82,-39,-40,-41,-42,-43,-44,-37,-38,]),'OR':([60,61,64,65,66,74,94,95,96,97,98,99,100,101,],[83,-36,-31,-32,-33,83,-39,-40,-41,-42,-43,-44,-37,-38,]),'UNIQUE':([67,68,69,108,],[86,-25,-26,-27,]),'PRIMARY':([72,],[91,]),'KEY':([91,],[106,]),}
+_lr_action_items = {'INSERT':([0,],[11,]),'QUIT':([0,],[18,]),'EXECUTE':([0,],[19,]),'CREATE':([0,],[20,]),'SELECT':([0,],[21,]),'DELETE':([0,],[22,]),'DROP':([0,],[23,]),'$end':([1,2,3,4,5,6,7,8,9,10,12,13,14,15,16,17,25,37,52,54,55,58,70,84,93,101,121,124,130,],[0,-1,-2,-3,-4,-5,-6,-7,-8,-9,-11,-12,-13,-14,-15,-16,-17,-60,-56,-58,-59,-61,-10,-38,-57,-18,-39,-19,-20,]),'INTO':([11,],[24,]),'SEMICOLON':([18,26,43,44,45,47,50,56,63,66,68,69,74,75,76,81,85,86,97,106,107,108,109,110,111,112,113,114,118,120,122,126,128,136,],[25,37,52,54,55,58,-46,70,84,-45,93,-47,-35,-36,-37,101,-46,-44,-31,121,-50,-51,-52,-53,-54,-55,-48,-49,124,-46,-32,130,-22,-21,]),'ID':([19,21,24,27,28,33,34,35,38,41,42,48,49,53,64,82,83,94,95,125,131,],[26,30,36,39,40,43,44,45,47,50,51,59,62,67,67,59,105,67,67,129,133,]),'TABLE':([20,23,],[27,34,]),'INDEX':([20,23,],[28,35,]),'STAR':([21,],[31,]),'FROM':([22,29,30,31,32,51,],[33,41,-42,-40,-41,-43,]),'DOT':([26,],[38,]),'COMMA':([30,32,51,56,60,61,72,73,74,75,76,77,78,79,97,99,103,115,116,122,123,],[-42,42,-43,71,82,-23,98,-33,-35,-36,-37,-25,-27,-28,-31,-26,-24,98,-34,-32,-29,]),'VALUES':([36,],[46,]),'LPAREN':([39,46,62,71,80,119,127,],[48,57,83,96,100,125,131,]),'ON':([40,],[49,]),'WHERE':([43,50,],[53,64,]),'LIMIT':([50,69,74,75,76,85,107,108,109,110,111,112,113,114,],[65,-47,-35,-36,-37,65,-50,-51,-52,-53,-54,-55,-48,-49,]),'ICONST':([57,65,87,88,89,90,91,92,96,98,100,134,],[74,86,74,74,74,74,74,74,74,74,117,135,]),'FCONST':([57,87,88,89,90,91,92,96,98,],[75,75,75,75,75,75,75,75,75,]),'SCONST':([57,87,88,89,90,91,92,96,98,],[76,76,76,76,76,76,76,76,76,]),'INT':([59,],[78,]),'FLOAT':([59,],[79,]),'CHAR':([59,],[80,]),'RPAREN':([60,61,72,73,74,75,76,77,78,79,99,102,103,105,115,116,117,123,129,132,135,],[81,-23,97,-33,-35,-36,-37,-25,-27,-28,-26,118,-24,120,122,-34,123,-29,132,-30,136,]),'GT':([67,],[87,]),'LT':([67,],[88,]),'EQ':([67,133,],[89,134,]),'GE':([67,],[90,]),'LE':([67,],[91,]),'NE':([67,],[92,]),'AND':([68,69,74,75,76,85,107,108,109,110,111,112,113,114,],[94,-47,-35,-36,-37,94,-50,-51,-52,-53,-54,-55,-48,-49,]),'OR':([68,69,74,75,76,85,107,108,109,110,111,112,113,114,],[95,-47,-35,-36,-37,95,-50,-51,-52,-53,-54,-55,-48,-49,]),'UNIQUE':([77,78,79,123,],[99,-27,-28,-29,]),'PRIMARY':([82,],[104,]),'KEY':([104,],[119,]),'WITH':([120,],[127,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -17,7 +17,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'sql_statement':([0,],[1,]),'create_statement':([0,],[2,]),'insert_statement':([0,],[3,]),'select_statement':([0,],[4,]),'delete_statement':([0,],[5,]),'drop_statement':([0,],[6,]),'quit_statement':([0,],[7,]),'execute_statement':([0,],[8,]),'create_table':([0,],[9,]),'create_index':([0,],[10,]),'select_all':([0,],[12,]),'conditional_select':([0,],[13,]),'delete_all':([0,],[14,]),'conditional_delete':([0,],[15,]),'drop_table':([0,],[16,]),'drop_index':([0,],[17,]),'column_list':([44,],[54,]),'column':([44,72,],[55,90,]),'conditions':([48,58,],[60,74,]),'condition':([48,58,82,83,],[61,61,100,101,]),'value_list':([51,],[62,]),'value':([51,75,76,77,78,79,80,85,],[63,94,95,96,97,98,99,103,]),'column_type':([53,],[67,]),'primary_clause':([72,],[89,]),}
+_lr_goto_items = {'sql_statement':([0,],[1,]),'create_statement':([0,],[2,]),'insert_statement':([0,],[3,]),'select_statement':([0,],[4,]),'delete_statement':([0,],[5,]),'drop_statement':([0,],[6,]),'quit_statement':([0,],[7,]),'execute_statement':([0,],[8,]),'create_table':([0,],[9,]),'create_index':([0,],[10,]),'select_all':([0,],[12,]),'conditional_select':([0,],[13,]),'delete_all':([0,],[14,]),'conditional_delete':([0,],[15,]),'drop_table':([0,],[16,]),'drop_index':([0,],[17,]),'select_list':([21,],[29,]),'id_list':([21,],[32,]),'row_list':([46,],[56,]),'column_list':([48,],[60,]),'column':([48,82,],[61,103,]),'limit_clause':([50,85,],[63,106,]),'empty':([50,85,120,],[66,66,128,]),'conditions':([53,64,],[68,85,]),'condition':([53,64,94,95,],[69,69,113,114,]),'value_list':([57,96,],[72,115,]),'value':([57,87,88,89,90,91,92,96,98,],[73,107,108,109,110,111,112,73,116,]),'column_type':([59,],[77,]),'primary_clause':([82,],[102,]),'index_options':([120,],[126,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -27,54 +27,65 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> sql_statement","S'",1,None,None,None),
-  ('sql_statement -> create_statement','sql_statement',1,'p_sql_statement','interpreter.py',99),
-  ('sql_statement -> insert_statement','sql_statement',1,'p_sql_statement','interpreter.py',100),
-  ('sql_statement -> select_statement','sql_statement',1,'p_sql_statement','interpreter.py',101),
-  ('sql_statement -> delete_statement','sql_statement',1,'p_sql_statement','interpreter.py',102),
-  ('sql_statement -> drop_statement','sql_statement',1,'p_sql_statement','interpreter.py',103),
-  ('sql_statement -> quit_statement','sql_statement',1,'p_sql_statement','interpreter.py',104),
-  ('sql_statement -> execute_statement','sql_statement',1,'p_sql_statement','interpreter.py',105),
-  ('create_statement -> create_table','create_statement',1,'p_create_statement','interpreter.py',112),
-  ('create_statement -> create_index','create_statement',1,'p_create_statement','interpreter.py',113),
-  ('insert_statement -> INSERT INTO ID VALUES LPAREN value_list RPAREN SEMICOLON','insert_statement',8,'p_insert_statement','interpreter.py',130),
-  ('select_statement -> select_all','select_statement',1,'p_select_statement','interpreter.py',146),
-  ('select_statement -> conditional_select','select_statement',1,'p_select_statement','interpreter.py',147),
-  ('delete_statement -> delete_all','delete_statement',1,'p_delete_statement','interpreter.py',169),
-  ('delete_statement -> conditional_delete','delete_statement',1,'p_delete_statement','interpreter.py',170),
-  ('drop_statement -> drop_table','drop_statement',1,'p_drop_statement','interpreter.py',184),
-  ('drop_statement -> drop_index','drop_statement',1,'p_drop_statement','interpreter.py',185),
-  ('quit_statement -> QUIT SEMICOLON','quit_statement',2,'p_quit_statement','interpreter.py',204),
-  ('create_table -> CREATE TABLE ID LPAREN column_list RPAREN SEMICOLON','create_table',7,'p_create_table','interpreter.py',214),
-  ('create_table -> CREATE TABLE ID LPAREN column_list COMMA primary_clause RPAREN SEMICOLON','create_table',9,'p_create_table','interpreter.py',215),
-  ('create_index -> CREATE INDEX ID ON ID LPAREN ID RPAREN SEMICOLON','create_index',9,'p_create_index','interpreter.py',231),
-  ('column_list -> column','column_list',1,'p_column_list','interpreter.py',243),
-  ('column_list -> column_list COMMA column','column_list',3,'p_column_list','interpreter.py',244),
-  ('column -> ID column_type','column',2,'p_column','interpreter.py',256),
-  ('column -> ID column_type UNIQUE','column',3,'p_column','interpreter.py',257),
-  ('column_type -> INT','column_type',1,'p_column_type','interpreter.py',267),
-  ('column_type -> FLOAT','column_type',1,'p_column_type','interpreter.py',268),
-  ('column_type -> CHAR LPAREN ICONST RPAREN','column_type',4,'p_column_type','interpreter.py',269),
-  ('primary_clause -> PRIMARY KEY LPAREN ID RPAREN','primary_clause',5,'p_primary_clause','interpreter.py',282),
-  ('value_list -> value','value_list',1,'p_value_list','interpreter.py',290),
-  ('value_list -> value_list COMMA value','value_list',3,'p_value_list','interpreter.py',291),
-  ('value -> ICONST','value',1,'p_value','interpreter.py',303),
-  ('value -> FCONST','value',1,'p_value','interpreter.py',304),
-  ('value -> SCONST','value',1,'p_value','interpreter.py',305),
-  ('select_all -> SELECT STAR FROM ID SEMICOLON','select_all',5,'p_select_all','interpreter.py',313),
-  ('conditional_select -> SELECT STAR FROM ID WHERE conditions SEMICOLON','conditional_select',7,'p_conditional_select','interpreter.py',323),
-  ('conditions -> condition','conditions',1,'p_conditions','interpreter.py',334),
-  ('conditions -> conditions AND condition','conditions',3,'p_conditions','interpreter.py',335),
-  ('conditions -> conditions OR condition','conditions',3,'p_conditions','interpreter.py',336),
-  ('condition -> ID GT value','condition',3,'p_condition','interpreter.py',349),
-  ('condition -> ID LT value','condition',3,'p_condition','interpreter.py',350),
-  ('condition -> ID EQ value','condition',3,'p_condition','interpreter.py',351),
-  ('condition -> ID GE value','condition',3,'p_condition','interpreter.py',352),
-  ('condition -> ID LE value','condition',3,'p_condition','interpreter.py',353),
-  ('condition -> ID NE value','condition',3,'p_condition','interpreter.py',354),
-  ('delete_all -> DELETE FROM ID SEMICOLON','delete_all',4,'p_delete_all','interpreter.py',363),
-  ('conditional_delete -> DELETE FROM ID WHERE conditions SEMICOLON','conditional_delete',6,'p_conditional_delete','interpreter.py',373),
-  ('drop_table -> DROP TABLE ID SEMICOLON','drop_table',4,'p_drop_table','interpreter.py',385),
-  ('drop_index -> DROP INDEX ID SEMICOLON','drop_index',4,'p_drop_index','interpreter.py',395),
-  ('execute_statement -> EXECUTE ID SEMICOLON','execute_statement',3,'p_execute_statement','interpreter.py',405),
-  ('execute_statement -> EXECUTE ID DOT ID SEMICOLON','execute_statement',5,'p_execute_statement','interpreter.py',406),
+  ('sql_statement -> create_statement','sql_statement',1,'p_sql_statement','interpreter.py',100),
+  ('sql_statement -> insert_statement','sql_statement',1,'p_sql_statement','interpreter.py',101),
+  ('sql_statement -> select_statement','sql_statement',1,'p_sql_statement','interpreter.py',102),
+  ('sql_statement -> delete_statement','sql_statement',1,'p_sql_statement','interpreter.py',103),
+  ('sql_statement -> drop_statement','sql_statement',1,'p_sql_statement','interpreter.py',104),
+  ('sql_statement -> quit_statement','sql_statement',1,'p_sql_statement','interpreter.py',105),
+  ('sql_statement -> execute_statement','sql_statement',1,'p_sql_statement','interpreter.py',106),
+  ('create_statement -> create_table','create_statement',1,'p_create_statement','interpreter.py',113),
+  ('create_statement -> create_index','create_statement',1,'p_create_statement','interpreter.py',114),
+  ('insert_statement -> INSERT INTO ID VALUES row_list SEMICOLON','insert_statement',6,'p_insert_statement','interpreter.py',142),
+  ('select_statement -> select_all','select_statement',1,'p_select_statement','interpreter.py',165),
+  ('select_statement -> conditional_select','select_statement',1,'p_select_statement','interpreter.py',166),
+  ('delete_statement -> delete_all','delete_statement',1,'p_delete_statement','interpreter.py',194),
+  ('delete_statement -> conditional_delete','delete_statement',1,'p_delete_statement','interpreter.py',195),
+  ('drop_statement -> drop_table','drop_statement',1,'p_drop_statement','interpreter.py',213),
+  ('drop_statement -> drop_index','drop_statement',1,'p_drop_statement','interpreter.py',214),
+  ('quit_statement -> QUIT SEMICOLON','quit_statement',2,'p_quit_statement','interpreter.py',237),
+  ('create_table -> CREATE TABLE ID LPAREN column_list RPAREN SEMICOLON','create_table',7,'p_create_table','interpreter.py',247),
+  ('create_table -> CREATE TABLE ID LPAREN column_list COMMA primary_clause RPAREN SEMICOLON','create_table',9,'p_create_table','interpreter.py',248),
+  ('create_index -> CREATE INDEX ID ON ID LPAREN ID RPAREN index_options SEMICOLON','create_index',10,'p_create_index','interpreter.py',264),
+  ('index_options -> WITH LPAREN ID EQ ICONST RPAREN','index_options',6,'p_index_options','interpreter.py',277),
+  ('index_options -> empty','index_options',1,'p_index_options','interpreter.py',278),
+  ('column_list -> column','column_list',1,'p_column_list','interpreter.py',286),
+  ('column_list -> column_list COMMA column','column_list',3,'p_column_list','interpreter.py',287),
+  ('column -> ID column_type','column',2,'p_column','interpreter.py',299),
+  ('column -> ID column_type UNIQUE','column',3,'p_column','interpreter.py',300),
+  ('column_type -> INT','column_type',1,'p_column_type','interpreter.py',310),
+  ('column_type -> FLOAT','column_type',1,'p_column_type','interpreter.py',311),
+  ('column_type -> CHAR LPAREN ICONST RPAREN','column_type',4,'p_column_type','interpreter.py',312),
+  ('primary_clause -> PRIMARY KEY LPAREN ID RPAREN','primary_clause',5,'p_primary_clause','interpreter.py',325),
+  ('row_list -> LPAREN value_list RPAREN','row_list',3,'p_row_list','interpreter.py',333),
+  ('row_list -> row_list COMMA LPAREN value_list RPAREN','row_list',5,'p_row_list','interpreter.py',334),
+  ('value_list -> value','value_list',1,'p_value_list','interpreter.py',345),
+  ('value_list -> value_list COMMA value','value_list',3,'p_value_list','interpreter.py',346),
+  ('value -> ICONST','value',1,'p_value','interpreter.py',358),
+  ('value -> FCONST','value',1,'p_value','interpreter.py',359),
+  ('value -> SCONST','value',1,'p_value','interpreter.py',360),
+  ('select_all -> SELECT select_list FROM ID limit_clause SEMICOLON','select_all',6,'p_select_all','interpreter.py',368),
+  ('conditional_select -> SELECT select_list FROM ID WHERE conditions limit_clause SEMICOLON','conditional_select',8,'p_conditional_select','interpreter.py',380),
+  ('select_list -> STAR','select_list',1,'p_select_list','interpreter.py',393),
+  ('select_list -> id_list','select_list',1,'p_select_list','interpreter.py',394),
+  ('id_list -> ID','id_list',1,'p_id_list','interpreter.py',401),
+  ('id_list -> id_list COMMA ID','id_list',3,'p_id_list','interpreter.py',402),
+  ('limit_clause -> LIMIT ICONST','limit_clause',2,'p_limit_clause','interpreter.py',413),
+  ('limit_clause -> empty','limit_clause',1,'p_limit_clause','interpreter.py',414),
+  ('empty -> <empty>','empty',0,'p_empty','interpreter.py',421),
+  ('conditions -> condition','conditions',1,'p_conditions','interpreter.py',428),
+  ('conditions -> conditions AND condition','conditions',3,'p_conditions','interpreter.py',429),
+  ('conditions -> conditions OR condition','conditions',3,'p_conditions','interpreter.py',430),
+  ('condition -> ID GT value','condition',3,'p_condition','interpreter.py',443),
+  ('condition -> ID LT value','condition',3,'p_condition','interpreter.py',444),
+  ('condition -> ID EQ value','condition',3,'p_condition','interpreter.py',445),
+  ('condition -> ID GE value','condition',3,'p_condition','interpreter.py',446),
+  ('condition -> ID LE value','condition',3,'p_condition','interpreter.py',447),
+  ('condition -> ID NE value','condition',3,'p_condition','interpreter.py',448),
+  ('delete_all -> DELETE FROM ID SEMICOLON','delete_all',4,'p_delete_all','interpreter.py',457),
+  ('conditional_delete -> DELETE FROM ID WHERE conditions SEMICOLON','conditional_delete',6,'p_conditional_delete','interpreter.py',467),
+  ('drop_table -> DROP TABLE ID SEMICOLON','drop_table',4,'p_drop_table','interpreter.py',479),
+  ('drop_index -> DROP INDEX ID SEMICOLON','drop_index',4,'p_drop_index','interpreter.py',489),
+  ('execute_statement -> EXECUTE ID SEMICOLON','execute_statement',3,'p_execute_statement','interpreter.py',499),
+  ('execute_statement -> EXECUTE ID DOT ID SEMICOLON','execute_statement',5,'p_execute_statement','interpreter.py',500),
 ]
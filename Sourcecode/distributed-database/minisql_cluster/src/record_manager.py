@@ -1,6 +1,13 @@
-from minisql_cluster.src.buffer_manager import BufferManager, pin
-from struct import Struct
+from minisql_cluster.src.buffer_manager import BufferManager
+from struct import Struct, calcsize
+import operator
 import os
+import re
+
+try:
+    import numpy
+except ImportError:  # the scans check the records one by one
+    numpy = None
 
 
 def convert_str_to_bytes(attributes):
@@ -19,199 +26,472 @@ def convert_bytes_to_str(attributes):
     return tuple(attr_list)
 
 
+_operators = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+
+def char_widths(fmt):
+    """Return a list with, for every field of the format, its width if it is a string, None otherwise"""
+    widths = []
+    for count, code in re.findall(r'(\d*)([a-zA-Z?])', fmt):
+        count = int(count) if count else 1
+        if code == 's':
+            widths.append(count)
+        elif code != 'x':  # pad bytes are no field
+            widths += [None] * count
+    return widths
+
+
+def field_formats(fmt):
+    """Return the format of every field of the little-endian format fmt, e.g. ['i', '20s', 'd'] for '<1i20s1d',
+    None if fmt isn't little-endian or has pad bytes, when the fields can't be skipped by their sizes alone"""
+    if not fmt.startswith('<'):
+        return None
+    formats = []
+    for count, code in re.findall(r'(\d*)([a-zA-Z?])', fmt):
+        count = int(count) if count else 1
+        if code == 's':
+            formats.append('{}s'.format(count))
+        elif code == 'x':
+            return None
+        else:
+            formats += [code] * count
+    return formats
+
+
+def compile_conditions(fmt, conditions):
+    """
+        Return a predicate on the records unpacked from a block, valid bit and next included, which is true
+        if the record is valid and meets the conditions, a dict: { attribute offset : {operator : value } }
+        The strings are encoded and padded like the fields once, so the fields are compared without decoding
+    """
+    widths = char_widths(fmt)
+    checks = []
+    for position, condition in conditions.items():
+        for operator_type, value in condition.items():
+            if widths[position] is not None:
+                # b'ab\0' < b'abc' as 'ab' < 'abc', so padding keeps the order of the strings
+                value = str(value).encode('ASCII').ljust(widths[position], b'\0')
+            checks.append((position, _operators[operator_type], value))
+    if not checks:
+        return lambda record: record[-2] != b'0'
+    if len(checks) == 1:
+        (position, compare, value), = checks
+        return lambda record: record[-2] != b'0' and compare(record[position], value)
+
+    def predicate(record):
+        if record[-2] == b'0':  # check the valid bit, return false when meet empty record
+            return False
+        for position, compare, value in checks:
+            if not compare(record[position], value):
+                return False
+        return True
+
+    return predicate
+
+
+# the numpy types of the fields packed by struct with standard sizes, i.e. with '<'
+_numpy_types = {
+    'c': 'S1', 'b': 'i1', 'B': 'u1', '?': '?', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4',
+    'l': '<i4', 'L': '<u4', 'q': '<i8', 'Q': '<u8', 'e': '<f2', 'f': '<f4', 'd': '<f8',
+}
+
+
+def record_dtype(fmt):
+    """Return the numpy structured dtype of the records packed with the little-endian format fmt,
+    None if numpy isn't installed or a field can't be viewed by numpy"""
+    if numpy is None or not fmt.startswith('<'):
+        return None
+    names, formats, offsets = [], [], []
+    offset = 0
+    for count, code in re.findall(r'(\d*)([a-zA-Z?])', fmt):
+        count = int(count) if count else 1
+        if code == 's':
+            fields = [('S{}'.format(count), count)]
+        elif code == 'x':
+            fields = []
+            offset += count
+        elif code in _numpy_types:
+            fields = [(_numpy_types[code], numpy.dtype(_numpy_types[code]).itemsize)] * count
+        else:
+            return None
+        for field_format, size in fields:
+            names.append('f{}'.format(len(names)))
+            formats.append(field_format)
+            offsets.append(offset)
+            offset += size
+    return numpy.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+
+
+def compile_vector_conditions(fmt, conditions):
+    """
+        Like compile_conditions, but return a function from an array of records of record_dtype(fmt + 'ci')
+        to the mask of the records valid and meeting the conditions,
+        None if a value can't be compared with its field by numpy, e.g. a string with an int
+    """
+    widths = char_widths(fmt)
+    checks = []
+    for position, condition in conditions.items():
+        for operator_type, value in condition.items():
+            if widths[position] is not None:
+                # numpy compares the strings as padded with NULs, like compile_conditions
+                value = str(value).encode('ASCII')
+            elif isinstance(value, (str, bytes)):
+                return None
+            checks.append(('f{}'.format(position), _operators[operator_type], value))
+    valid = 'f{}'.format(len(widths))
+
+    def mask_of(records):
+        mask = records[valid] != b'0'
+        for name, compare, value in checks:
+            mask &= compare(records[name], value)
+        return mask
+
+    return mask_of
+
+
 class Record:
     # The format of header should be the same for all records files.
     header_format = '<ii'  # will be confirmed by RecordManager
     header_struct = Struct(header_format)
+    # with numpy, the scans test the records of this many blocks at once
+    scan_batch_blocks = 64
 
     def __init__(self, file_path, fmt):
         self.buffer_manager = BufferManager()
         self.filename = file_path
+        self.fmt = fmt
         # Each record in file has 2 extra info: next's record_off and valid bit
         self.record_struct = Struct(fmt + 'ci')
+        self.dtype = record_dtype(fmt + 'ci')
+        self._projections = {}  # the structs unpacking some of the fields, by the positions of those fields
+        self.rec_per_blk = BufferManager.block_size // self.record_struct.size
+        self.rec_first_blk = (BufferManager.block_size - self.header_struct.size) // self.record_struct.size
+        # The header is read once and kept in memory, changes are written back by flush_header()
         self.first_free_rec, self.rec_tail = self._parse_header()
+        self.header_dirty = False
 
     def insert(self, attributes):
         """Insert the given record"""
         record_info = convert_str_to_bytes(attributes) + (b'1', -1)  # valid bit, next free space
-        self.first_free_rec, self.rec_tail = self._parse_header()
+        # Packed before any change, the header in memory is only changed once the record is written
+        data = self.record_struct.pack(*record_info)
         if self.first_free_rec >= 0:  # There are space in free list
-            first_free_blk, local_offset = self._calc(self.first_free_rec)
-            block = self.buffer_manager.get_file_block(self.filename, first_free_blk)
-            with pin(block):
-                data = block.read()
-                records = self._parse_block_data(data, first_free_blk)
-                next_free_rec = records[self.first_free_rec][-1]
-                records[local_offset] = record_info
-                new_data = self._generate_new_data(records, first_free_blk)
-                block.write(new_data)
             position = self.first_free_rec
+            first_free_blk, local_offset = self._calc(position)
+            slot = self._slot(first_free_blk, local_offset)
+            with self.buffer_manager.pinned(self.filename, first_free_blk) as block:
+                next_free_rec = self.record_struct.unpack_from(block.read(), slot)[-1]
+                block.write_into(slot, data)
             self.first_free_rec = next_free_rec
         else:  # No space in free list, append the new record to the end of file
-            self.rec_tail += 1
-            block_offset, local_offset = self._calc(self.rec_tail)
-            block = self.buffer_manager.get_file_block(self.filename, block_offset)
-            with pin(block):
-                data = block.read()
-                records = self._parse_block_data(data, block_offset)
-                records.append(record_info)
-                new_data = self._generate_new_data(records, block_offset)
-                block.write(new_data)
-            position = self.rec_tail
+            position = self.rec_tail + 1
+            block_offset, local_offset = self._calc(position)
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                block.write_into(self._slot(block_offset, local_offset), data)
+            self.rec_tail = position
         self._update_header()
         return position
 
+    def insert_many(self, rows):
+        """Insert the given records, filling the free list first and then appending blocks,
+        and return their positions
+        every record is packed before any is written, so a bad one leaves the table unchanged"""
+        records = [self.record_struct.pack(*convert_str_to_bytes(attributes), b'1', -1) for attributes in rows]
+        positions = []
+        i = 0
+        while i < len(records) and self.first_free_rec >= 0:  # the free slots of a block under a single pin
+            block_offset = self._calc(self.first_free_rec)[0]
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                while i < len(records) and self.first_free_rec >= 0:
+                    free_blk, local_offset = self._calc(self.first_free_rec)
+                    if free_blk != block_offset:
+                        break
+                    slot = self._slot(free_blk, local_offset)
+                    next_free_rec = self.record_struct.unpack_from(block.read(), slot)[-1]
+                    block.write_into(slot, records[i])
+                    positions.append(self.first_free_rec)
+                    self.first_free_rec = next_free_rec
+                    i += 1
+        while i < len(records):  # the rest are appended, the records of a block written at once
+            block_offset, local_offset = self._calc(self.rec_tail + 1)
+            rec_in_blk = self.rec_first_blk if block_offset == 0 else self.rec_per_blk
+            count = min(len(records) - i, rec_in_blk - local_offset)
+            data = b''.join(records[i:i + count])
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                block.write_into(self._slot(block_offset, local_offset), data)
+            positions.extend(range(self.rec_tail + 1, self.rec_tail + 1 + count))
+            self.rec_tail += count
+            i += count
+        self._update_header()
+        return positions
+
     def remove(self, record_offset):
         """Remove the record at specified position and update the free list"""
-        self.first_free_rec, self.rec_tail = self._parse_header()
+        if not 0 <= record_offset <= self.rec_tail:
+            raise IndexError('The offset points to an empty space')
         block_offset, local_offset = self._calc(record_offset)
-        block = self.buffer_manager.get_file_block(self.filename, block_offset)
-        with pin(block):
-            data = block.read()
-            records = self._parse_block_data(data, block_offset)
-            try:
-                records[local_offset][-1]
-            except IndexError:
-                raise IndexError('The offset points to an empty space')
-            if records[local_offset][-2] == b'0':
+        slot = self._slot(block_offset, local_offset)
+        with self.buffer_manager.pinned(self.filename, block_offset) as block:
+            record = list(self.record_struct.unpack_from(block.read(), slot))
+            if record[-2] == b'0':
                 raise RuntimeError('Cannot remove an empty record')
-            records[local_offset][-1] = self.first_free_rec  # A positive number, putting this position into free list
-            records[local_offset][-2] = b'0'
-            self.first_free_rec = record_offset  # update the head of free list
-            new_data = self._generate_new_data(records, block_offset)
-            block.write(new_data)
+            record[-1] = self.first_free_rec  # A positive number, putting this position into free list
+            record[-2] = b'0'
+            block.pack_into(self.record_struct, slot, *record)
+        self.first_free_rec = record_offset  # update the head of free list
         self._update_header()
 
     def modify(self, attributes, record_offset):
         """Modify the record at specified offset"""
         block_offset, local_offset = self._calc(record_offset)
-        block = self.buffer_manager.get_file_block(self.filename, block_offset)
+        slot = self._slot(block_offset, local_offset)
         record_info = convert_str_to_bytes(attributes) + (b'1', -1)  # Updated record must be real
-        with pin(block):
-            data = block.read()
-            records = self._parse_block_data(data, block_offset)
-            if records[local_offset][-2] == b'0':
+        with self.buffer_manager.pinned(self.filename, block_offset) as block:
+            if self.record_struct.unpack_from(block.read(), slot)[-2] == b'0':
                 raise RuntimeError('Cannot update an empty record')
-            records[local_offset] = record_info
-            new_data = self._generate_new_data(records, block_offset)
-            block.write(new_data)
+            block.pack_into(self.record_struct, slot, *record_info)
 
-    def read(self, record_offset):
-        """ Return the record at the corresponding position """
+    def read(self, record_offset, columns=None):
+        """ Return the record at the corresponding position, only the fields at the positions in columns if given """
         block_offset, local_offset = self._calc(record_offset)
-        block = self.buffer_manager.get_file_block(self.filename, block_offset)
-        with pin(block):
-            data = block.read()
-            records = self._parse_block_data(data, block_offset)
-            if records[local_offset][-2] == b'0':
+        if columns is None:
+            record_struct, picks = self.record_struct, None
+        else:
+            record_struct, fmt, where = self._projected(columns)
+            picks = [where[position] for position in columns]
+        with self.buffer_manager.pinned(self.filename, block_offset) as block:
+            record = record_struct.unpack_from(block.read(), self._slot(block_offset, local_offset))
+            if record[-2] == b'0':
                 raise RuntimeError('Cannot read an empty record')
-        return convert_bytes_to_str(tuple(records[local_offset][:-2]))
+        if picks is None:
+            return convert_bytes_to_str(record[:-2])
+        return convert_bytes_to_str(tuple(record[i] for i in picks))
+
+    def read_many(self, record_offsets, columns=None):
+        """ Return the records at the positions given, in the same order, like read,
+        each block holding some of them is pinned once and only their slots are unpacked """
+        if columns is None:
+            record_struct, picks = self.record_struct, None
+        else:
+            record_struct, fmt, where = self._projected(columns)
+            picks = [where[position] for position in columns]
+        by_block = {}  # block offset -> [(index in record_offsets, local offset)]
+        for i, record_offset in enumerate(record_offsets):
+            block_offset, local_offset = self._calc(record_offset)
+            by_block.setdefault(block_offset, []).append((i, local_offset))
+        records = [None] * len(record_offsets)
+        for block_offset in sorted(by_block):
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                data = block.read()
+                for i, local_offset in by_block[block_offset]:
+                    record = record_struct.unpack_from(data, self._slot(block_offset, local_offset))
+                    if record[-2] == b'0':
+                        raise RuntimeError('Cannot read an empty record')
+                    records[i] = record[:-2] if picks is None else tuple(record[j] for j in picks)
+        return [convert_bytes_to_str(record) for record in records]
 
-    def scanning_select(self, conditions):
+    def scanning_select(self, conditions, columns=None):
         # condition should be a dict: { attribute offset : {operator : value } }
+        # columns, the positions of the fields to return in this order, all of them if None
+        # a generator, the blocks are read one at a time as the records are consumed,
+        # and no block stays pinned between two records
+        mask_of = self._compile_vector(conditions)
+        if mask_of is not None:
+            yield from self._vector_select(mask_of, columns)
+            return
+        if columns is None:
+            predicate = compile_conditions(self.fmt, conditions)
+            record_struct, picks = self.record_struct, None
+        else:  # only the fields returned or tested are unpacked
+            record_struct, fmt, where = self._projected(list(columns) + list(conditions))
+            predicate = compile_conditions(fmt, {where[position]: condition
+                                                 for position, condition in conditions.items()})
+            picks = [where[position] for position in columns]
         total_blk = self._calc(self.rec_tail)[0] + 1
-        result_set = []
         for block_offset in range(total_blk):
-            block = self.buffer_manager.get_file_block(self.filename, block_offset)
-            records = self._parse_block_data(block.read(), block_offset)
-            result_set += tuple([convert_bytes_to_str(record[:-2]) for record in records
-                                 if self._check_condition(record, conditions) is True])
-        return result_set
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                records = self._parse_block_data(block.read(), block_offset, record_struct)
+            for record in records:
+                if predicate(record):
+                    if picks is None:
+                        yield convert_bytes_to_str(record[:-2])
+                    else:
+                        yield convert_bytes_to_str(tuple(record[i] for i in picks))
+
+    def _projected(self, positions):
+        # a struct unpacking the fields at positions, then the valid bit and next, skipping the other fields,
+        # its format without the valid bit and next, and where each of those fields lands in the unpacked tuple
+        key = tuple(sorted(set(positions)))
+        projection = self._projections.get(key)
+        if projection is None:
+            formats = field_formats(self.fmt)
+            if formats is None:  # every field is unpacked
+                projection = (self.record_struct, self.fmt, {position: position for position in key})
+            else:
+                fmt = '<'
+                where = {}
+                for position, field_format in enumerate(formats):
+                    if position in key:
+                        where[position] = len(where)
+                        fmt += field_format
+                    else:
+                        fmt += '{}x'.format(calcsize('<' + field_format))
+                projection = (Struct(fmt + 'ci'), fmt, where)
+            self._projections[key] = projection
+        return projection
+
+    def _vector_select(self, mask_of, columns=None):
+        # the records of a batch of blocks are copied into an array and tested at once,
+        # then only those matching are turned into tuples
+        # the batches grow from a block to scan_batch_blocks, so that a query with a LIMIT reads little more
+        total_blk = self._calc(self.rec_tail)[0] + 1
+        first_blk, batch_blocks = 0, 1
+        while first_blk < total_blk:
+            batch = bytearray()
+            for block_offset in range(first_blk, min(first_blk + batch_blocks, total_blk)):
+                with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                    data = block.read()
+                    lower_bound, upper_bound = self._block_bounds(len(data), block_offset)
+                    batch += data[lower_bound:upper_bound]
+            records = numpy.frombuffer(batch, self.dtype)
+            if columns is None:
+                for record in records[mask_of(records)].tolist():
+                    yield convert_bytes_to_str(record[:-2])
+            else:  # only the fields of the columns are turned into python objects, each once
+                fields = sorted(set(columns))
+                picks = [fields.index(position) for position in columns]
+                for record in records[mask_of(records)][[self.dtype.names[i] for i in fields]].tolist():
+                    yield convert_bytes_to_str(tuple(record[i] for i in picks))
+            first_blk += batch_blocks
+            batch_blocks = min(batch_blocks * 2, self.scan_batch_blocks)
 
     def scanning_delete(self, conditions):
+        # only the slots of the records deleted are written, a run of consecutive ones at once,
+        # so only the blocks holding them become dirty
+        mask_of = self._compile_vector(conditions)
+        predicate = None if mask_of is not None else compile_conditions(self.fmt, conditions)
         total_blk = self._calc(self.rec_tail)[0] + 1
-        record_offset = 0
+        deleted = False
         for block_offset in range(total_blk):
-            block = self.buffer_manager.get_file_block(self.filename, block_offset)
-            records = self._parse_block_data(block.read(), block_offset)
-            for i, record in enumerate(records):
-                if self._check_condition(convert_bytes_to_str(record), conditions):
-                    records[i][-2] = b'0'
-                    records[i][-1] = self.first_free_rec
-                    self.first_free_rec = record_offset
-                record_offset += 1
-            block.write(self._generate_new_data(records, block_offset))
-        self._update_header()
+            first_rec = self._calc_first(block_offset)
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                data = block.read()
+                for begin, end in self._runs(self._match_block(data, block_offset, predicate, mask_of)):
+                    slot = self._slot(block_offset, begin)
+                    run = bytearray(data[slot:slot + (end - begin) * self.record_struct.size])
+                    for i in range(end - begin):
+                        record = list(self.record_struct.unpack_from(run, i * self.record_struct.size))
+                        record[-2] = b'0'
+                        record[-1] = self.first_free_rec
+                        self.record_struct.pack_into(run, i * self.record_struct.size, *record)
+                        self.first_free_rec = first_rec + begin + i
+                    block.write_into(slot, run)
+                    deleted = True
+        if deleted:
+            self._update_header()
 
     def scanning_update(self, conditions, attributes):
         # The file header won't change when updating
+        # only the slots of the records updated are written, a run of consecutive ones at once
+        mask_of = self._compile_vector(conditions)
+        predicate = None if mask_of is not None else compile_conditions(self.fmt, conditions)
+        new_data = self.record_struct.pack(*(convert_str_to_bytes(attributes) + (b'1', -1)))
         total_blk = self._calc(self.rec_tail)[0] + 1
-        new_record = convert_str_to_bytes(attributes) + (b'1', -1)
         for block_offset in range(total_blk):
-            block = self.buffer_manager.get_file_block(self.filename, block_offset)
-            records = self._parse_block_data(block.read(), block_offset)
-            for i, record in enumerate(records):
-                if self._check_condition(convert_bytes_to_str(record), conditions):
-                    records[i] = new_record
-            block.write(self._generate_new_data(records, block_offset))
+            with self.buffer_manager.pinned(self.filename, block_offset) as block:
+                for begin, end in self._runs(self._match_block(block.read(), block_offset, predicate, mask_of)):
+                    block.write_into(self._slot(block_offset, begin), new_data * (end - begin))
+
+    def _match_block(self, data, blk_offset, predicate, mask_of):
+        # the positions in the block of the records meeting the conditions,
+        # tested with mask_of if numpy is used, otherwise with predicate
+        lower_bound, upper_bound = self._block_bounds(len(data), blk_offset)
+        if mask_of is not None:
+            return numpy.flatnonzero(mask_of(numpy.frombuffer(data[lower_bound:upper_bound], self.dtype))).tolist()
+        return [i for i, record in enumerate(self.record_struct.iter_unpack(data[lower_bound:upper_bound]))
+                if predicate(record)]
+
+    @staticmethod
+    def _runs(positions):
+        # the runs of consecutive positions of an ascending list, as (first, last + 1)
+        begin = 0
+        while begin < len(positions):
+            end = begin + 1
+            while end < len(positions) and positions[end] == positions[end - 1] + 1:
+                end += 1
+            yield positions[begin], positions[end - 1] + 1
+            begin = end
 
     def _calc(self, record_offset):
-        rec_per_blk = BufferManager.block_size // self.record_struct.size
-        rec_first_blk = (BufferManager.block_size - self.header_struct.size) // self.record_struct.size
-        if record_offset < rec_first_blk:  # in 1st block
+        if record_offset < self.rec_first_blk:  # in 1st block
             return 0, record_offset
         else:  # not in 1st block
-            block_offset = (record_offset - rec_first_blk) // rec_per_blk + 1
-            local_offset = record_offset - rec_first_blk - (block_offset - 1) * rec_per_blk
-            return block_offset, local_offset
+            block_offset, local_offset = divmod(record_offset - self.rec_first_blk, self.rec_per_blk)
+            return block_offset + 1, local_offset
 
-    @staticmethod
-    def _check_condition(record, conditions):
-        if record[-2] == b'0':  # check the valid bit, return false when meet empty record
-            return False
-        str_record = convert_bytes_to_str(record[:-2])
-        for position, condition in conditions.items():
-            value = str_record[position]
-            for operator_type, value_restriction in condition.items():
-                if operator_type == '=':
-                    if value != value_restriction:
-                        return False
-                elif operator_type == '>':
-                    if value <= value_restriction:
-                        return False
-                elif operator_type == '<':
-                    if value >= value_restriction:
-                        return False
-        return True
+    def _calc_first(self, block_offset):
+        # the offset of the first record in the given block
+        if block_offset == 0:
+            return 0
+        return self.rec_first_blk + (block_offset - 1) * self.rec_per_blk
 
-    def _generate_new_data(self, records, blk_offset):
-        if blk_offset == 0:
-            data = bytearray(self.header_struct.size)
-        else:
-            data = bytearray()
-        for r in records:
-            data += self.record_struct.pack(*r)
-        return data
-
-    def _parse_block_data(self, data, blk_offset):
-        upper_bound = len(data)
-        if (upper_bound - self.header_struct.size) % self.record_struct.size != 0:
-            upper_bound -= self.record_struct.size
+    def _slot(self, block_offset, local_offset):
+        # where the record at local_offset begins in the block
+        if block_offset == 0:
+            return self.header_struct.size + local_offset * self.record_struct.size
+        return local_offset * self.record_struct.size
+
+    def _compile_vector(self, conditions):
+        # the function testing arrays of records, None to check them one by one
+        if self.dtype is None:
+            return None
+        return compile_vector_conditions(self.fmt, conditions)
+
+    def _block_bounds(self, data_size, blk_offset):
+        # where the records of the block begin and end in its data
+        # the records in the block are counted from the tail of the records,
+        # rather than from the size of the data, which may have room left for no whole record
         if blk_offset == 0:  # is the first block, need to consider the header
             lower_bound = self.header_struct.size
         else:  # not the first block, all data are records
             lower_bound = 0
-        records = [list(self.record_struct.unpack_from(data, offset))
+        count = min(self.rec_tail - self._calc_first(blk_offset) + 1,
+                    (data_size - lower_bound) // self.record_struct.size)
+        return lower_bound, lower_bound + max(count, 0) * self.record_struct.size
+
+    def _parse_block_data(self, data, blk_offset, record_struct=None):
+        # record_struct, e.g. one unpacking some of the fields, is self.record_struct by default
+        record_struct = record_struct or self.record_struct
+        lower_bound, upper_bound = self._block_bounds(len(data), blk_offset)
+        records = [list(record_struct.unpack_from(data, offset))
                    for offset in range(lower_bound, upper_bound, self.record_struct.size)]
         return records
 
     def _parse_header(self):
         # Parse the file header, refresh corresponding info
         # and return the info with a tuple
-        block = self.buffer_manager.get_file_block(self.filename, 0)  # Get the first block
-        with pin(block):
+        with self.buffer_manager.pinned(self.filename, 0) as block:  # Get the first block
             data = block.read()
             header_info = self.header_struct.unpack_from(data, 0)
         return header_info
 
     def _update_header(self):
-        # Update the file header after modifying the records
-        block = self.buffer_manager.get_file_block(self.filename, 0)
-        with pin(block):
-            data = block.read()
-            header_info = (self.first_free_rec, self.rec_tail)
-            data[:self.header_struct.size] = self.header_struct.pack(*header_info)
-            block.write(data)
+        # The file header is changed by modifying the records, it is written back lazily
+        self.header_dirty = True
+
+    def flush_header(self):
+        """Write the header kept in memory into the first block, if it has changed"""
+        if self.header_dirty:
+            with self.buffer_manager.pinned(self.filename, 0) as block:
+                block.pack_into(self.header_struct, 0, self.first_free_rec, self.rec_tail)
+            self.header_dirty = False
 
 
 class RecordManager:
@@ -222,6 +502,9 @@ class RecordManager:
     header_format = '<ii'  # free_list_head and records_tail.
     header_struct = Struct(header_format)
     file_dir = '/'
+    # The open tables, by file path, so that the record struct, the slot geometry and the header
+    # are kept across calls; the headers are written back in a batch by flush_headers()
+    open_tables = {}
 
     @classmethod
     def init_table(cls, table_name):
@@ -234,6 +517,28 @@ class RecordManager:
         else:
             with open(file_path, 'w+b') as file:
                 file.write(cls.header_struct.pack(*(-1, -1)))
+            cls.open_tables.pop(file_path, None)
+            BufferManager().invalidate(file_path)  # blocks left from a former file of the same name
+
+    @classmethod
+    def open_table(cls, table_name, fmt):
+        """Return the Record of the table, opening it on first use"""
+        file_path = cls.file_dir + table_name + '.table'
+        record = cls.open_tables.get(file_path)
+        if record is None or record.fmt != fmt:
+            record = cls.open_tables[file_path] = Record(file_path, fmt)
+        return record
+
+    @classmethod
+    def close_table(cls, table_name):
+        """Forget the open table without writing its header, e.g. when the table is dropped"""
+        cls.open_tables.pop(cls.file_dir + table_name + '.table', None)
+
+    @classmethod
+    def flush_headers(cls):
+        """Write the changed headers of all the open tables into the buffer"""
+        for record in list(cls.open_tables.values()):
+            record.flush_header()
 
     @classmethod
     def insert(cls, table_name, fmt, attributes):
@@ -241,15 +546,22 @@ class RecordManager:
             insert the given record into a suitable space,
             and return the offset of the inserted record
         """
-        file_path = cls.file_dir + table_name + '.table'
-        record = Record(file_path, fmt)
+        record = cls.open_table(table_name, fmt)
         position = record.insert(attributes)
         return position
 
+    @classmethod
+    def insert_many(cls, table_name, fmt, rows):
+        """
+            insert the given records in a batch,
+            and return the offsets of the inserted records
+        """
+        record = cls.open_table(table_name, fmt)
+        return record.insert_many(rows)
+
     @classmethod
     def delete(cls, table_name, fmt, *, with_index, record_offset=None, conditions=None):
-        file_path = cls.file_dir + table_name + '.table'
-        record = Record(file_path, fmt)
+        record = cls.open_table(table_name, fmt)
         if with_index:
             if record_offset is None:
                 raise RuntimeError('Not specify record offset when using index')
@@ -261,8 +573,7 @@ class RecordManager:
 
     @classmethod
     def update(cls, table_name, fmt, attributes, *, with_index, record_offset=None, conditions=None):
-        file_path = cls.file_dir + table_name + '.table'
-        record = Record(file_path, fmt)
+        record = cls.open_table(table_name, fmt)
         if with_index:
             if record_offset is None:
                 raise RuntimeError('Not specify record offset when using index')
@@ -273,17 +584,24 @@ class RecordManager:
             return record.scanning_update(conditions, attributes)
 
     @classmethod
-    def select(cls, table_name, fmt, *, with_index, record_offset=None, conditions=None):
-        file_path = cls.file_dir + table_name + '.table'
-        record = Record(file_path, fmt)
+    def select(cls, table_name, fmt, *, with_index, record_offset=None, conditions=None, columns=None):
+        # columns, the positions of the attributes to return, in this order, all of them if None
+        record = cls.open_table(table_name, fmt)
         if with_index:
             if record_offset is None:
                 raise RuntimeError('Not specify record offset when using index')
-            return record.read(record_offset)
+            return record.read(record_offset, columns)
         else:
             if conditions is None:
                 raise RuntimeError('Not specify condition when not using index')
-            return record.scanning_select(conditions)
+            return record.scanning_select(conditions, columns)  # a generator, the table is read as it is consumed
+
+    @classmethod
+    def select_many(cls, table_name, fmt, record_offsets, columns=None):
+        # the records at record_offsets, e.g. found in an index, in the same order,
+        # reading each block once however many of them it holds
+        record = cls.open_table(table_name, fmt)
+        return record.read_many(record_offsets, columns)
 
     @classmethod
     def set_file_dir(cls, file_dir):
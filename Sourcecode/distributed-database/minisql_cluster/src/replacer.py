@@ -0,0 +1,119 @@
+from collections import OrderedDict
+
+
+class LRUReplacer:
+    """evict the least recently used block
+    cheap, but a single sequential scan larger than the pool flushes the whole working set"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._queue = OrderedDict()  # the least recently used key comes first
+
+    def __len__(self):
+        return len(self._queue)
+
+    def admit(self, key):
+        """a block is loaded into the buffer"""
+        self._queue[key] = None
+
+    def access(self, key):
+        """a cached block is accessed again"""
+        self._queue.move_to_end(key)
+
+    def remove(self, key):
+        """a block leaves the buffer without being chosen as a victim, e.g. its file is detached"""
+        self._queue.pop(key, None)
+
+    def evict(self, evictable):
+        """choose a victim among the keys accepted by evictable, forget it and return it
+        return None if no key is accepted"""
+        return _evict_from(self._queue, evictable)
+
+    def resize(self, capacity):
+        """the buffer is resized; the keys are kept in their order"""
+        self.capacity = capacity
+
+
+class TwoQReplacer:
+    """2Q (Johnson & Shasha, VLDB '94)
+    a new block enters the fifo queue a1in, and is promoted into the lru queue am only when it is
+    referenced again, either while still in a1in or after it left a1in but its key is still
+    remembered in the ghost queue a1out
+    victims are taken from a1in as long as it is larger than its share of the pool,
+    so blocks touched once by a sequential scan never displace the hot blocks in am,
+    such as the root and internal nodes of the B+ trees"""
+
+    def __init__(self, capacity, kin=0.25, kout=0.5):
+        self._kin_ratio = kin
+        self._kout_ratio = kout
+        self._a1in = OrderedDict()  # resident, fifo order
+        self._a1out = OrderedDict()  # not resident, only keys are kept
+        self._am = OrderedDict()  # resident, lru order
+        self.resize(capacity)
+
+    def __len__(self):
+        return len(self._a1in) + len(self._am)
+
+    def admit(self, key):
+        if key in self._a1out:  # re-referenced after leaving a1in, so it is hot
+            del self._a1out[key]
+            self._am[key] = None
+        else:
+            self._a1in[key] = None
+
+    def access(self, key):
+        if key in self._am:
+            self._am.move_to_end(key)
+        else:
+            del self._a1in[key]
+            self._am[key] = None
+
+    def remove(self, key):
+        self._a1in.pop(key, None)
+        self._am.pop(key, None)
+
+    def evict(self, evictable):
+        if len(self._a1in) > self.kin or not self._am:
+            key = _evict_from(self._a1in, evictable)
+            if key is not None:
+                self._a1out[key] = None
+                if len(self._a1out) > self.kout:
+                    self._a1out.popitem(last=False)
+                return key
+        key = _evict_from(self._am, evictable)
+        if key is None:  # everything in am is pinned, fall back to a1in
+            key = _evict_from(self._a1in, evictable)
+        return key
+
+    def resize(self, capacity):
+        self.capacity = capacity
+        self.kin = max(1, int(capacity * self._kin_ratio))  # the size threshold of a1in
+        self.kout = max(1, int(capacity * self._kout_ratio))  # the size limit of a1out
+        while len(self._a1out) > self.kout:
+            self._a1out.popitem(last=False)
+
+
+def _evict_from(queue, evictable):
+    """pop the first evictable key of an ordered queue
+    a rejected key (typically a pinned block) is rotated to the end, since it is obviously in use,
+    so every key is skipped at most once and the amortized cost stays O(1)"""
+    for _ in range(len(queue)):
+        key = next(iter(queue))
+        if evictable(key):
+            del queue[key]
+            return key
+        queue.move_to_end(key)
+    return None
+
+
+replacers = {
+    'lru': LRUReplacer,
+    '2q': TwoQReplacer,
+}
+
+
+def create_replacer(policy, capacity):
+    try:
+        return replacers[policy.lower()](capacity)
+    except KeyError:
+        raise ValueError('unknown replacement policy {}'.format(policy)) from None